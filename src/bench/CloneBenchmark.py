@@ -0,0 +1,107 @@
+"""
+Compare the ways to clone AST subtrees: ASTUtils.deepcopy, copy.deepcopy and unparse/parse.
+
+Every statement of the samples is cloned by each method, the best of several rounds is reported.
+
+example:
+
+python ./src/bench/CloneBenchmark.py -d ./src/test -repeat 5
+"""
+from __future__ import annotations
+
+import ast
+import copy
+import os
+import sys
+import time
+from typing import Callable, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main"))
+
+from utils.ASTUtils import ASTUtils  # noqa: E402
+
+
+def reparse(node: ast.AST) -> Optional[ast.AST]:
+    """
+    The way used before ASTUtils.deepcopy, fails for nodes which can't be unparsed alone.
+    """
+    try:
+        return ast.parse(ast.unparse(node)).body[0]
+    except (SyntaxError, IndexError):
+        return None
+
+
+METHODS: dict[str, Callable[[ast.AST], Optional[ast.AST]]] = {
+    "ASTUtils.deepcopy": ASTUtils.deepcopy,
+    "ASTUtils.deepcopy(shareConstants)": lambda node: ASTUtils.deepcopy(node, shareConstants=True),
+    "copy.deepcopy": copy.deepcopy,
+    "unparse/parse": reparse
+}
+
+
+def collect(paths: list[str]) -> list[ast.AST]:
+    nodes: list[ast.AST] = []
+    for path in paths:
+        with open(path, "rb") as f:
+            try:
+                module = ast.parse(f.read())
+            except SyntaxError:
+                continue
+        # statements at any depth, like the bodies cloned by loop unfolding
+        nodes.extend(node for node in ast.walk(module) if isinstance(node, ast.stmt))
+    return nodes
+
+
+def measure(method: Callable[[ast.AST], Optional[ast.AST]], nodes: list[ast.AST], repeat: int) -> tuple[float, int]:
+    """
+    :return: the best time of the rounds, and the count of nodes the method fails to clone.
+    """
+    best = float("inf")
+    failed = 0
+    for _ in range(repeat):
+        failed = 0
+        start = time.perf_counter()
+        for node in nodes:
+            if method(node) is None:
+                failed += 1
+        best = min(best, time.perf_counter() - start)
+    return best, failed
+
+
+def main(*args: str) -> None:
+    paths: list[str] = []
+    repeat = 5
+
+    index = 0
+    while index < len(args):
+        match args[index].lower():
+            case "-f":
+                paths.append(args[index + 1])
+            case "-d":
+                for root, dirs, files in os.walk(args[index + 1]):
+                    paths.extend(os.path.join(root, file) for file in sorted(files) if file.endswith(".py"))
+            case "-repeat":
+                repeat = max(1, int(args[index + 1]))
+        index += 2
+
+    if len(paths) == 0:
+        mainDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main")
+        return main("-d", mainDir, *args)
+
+    nodes = collect(paths)
+    # the clone must be equal to the original, with the locations
+    for node in nodes:
+        assert ast.dump(ASTUtils.deepcopy(node), include_attributes=True) == ast.dump(node, include_attributes=True)
+
+    print(f"Cloning {len(nodes)} statements from {len(paths)} files, best of {repeat}:")
+    baseline: Optional[float] = None
+    for name, method in METHODS.items():
+        elapsed, failed = measure(method, nodes, repeat)
+        if baseline is None:
+            baseline = elapsed
+        print(f"{name:<36} {elapsed * 1000:>10.2f}ms {elapsed / baseline:>8.2f}x"
+              f"{f'  {failed} failed' if failed > 0 else ''}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1::])
@@ -0,0 +1,125 @@
+"""
+Measure the startup cost of Pylang with '-X importtime'.
+
+For every level, a fresh interpreter imports Pylang and registers the transformers of that level, like a real run does
+before parsing anything. Exits with 1 if the imports take longer than the budget, or a level loads a module it doesn't
+need, like the Cython toolchain below O3.
+
+example:
+
+python ./src/bench/ImportTimeBenchmark.py -levels 0,1,2,3 -budget 250 -repeat 5
+"""
+from __future__ import annotations
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Optional
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main")
+
+# executed in the subprocess: start up like Pylang.main does, without transforming anything
+STARTUP = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from Pylang import Pylang
+from log.LogLevel import LogLevel
+from log.Logger import Logger
+from transformers.OptimizeLevel import OptimizeLevel
+from transformers.TransManager import TransManager
+Pylang()
+TransManager(Logger(LogLevel.ERROR), OptimizeLevel(int(sys.argv[2]))).register()
+"""
+
+# top-level packages which must not be imported below the level
+FORBIDDEN: dict[str, int] = {
+    "Cython": 3,
+    "setuptools": 3
+}
+
+
+def measure(level: int) -> tuple[int, dict[str, int]]:
+    """
+    Start up once.
+
+    :return: the total import time in microseconds, and the self import time summed over every top-level package.
+    """
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP, os.path.abspath(MAIN), str(level)],
+        stdin=subprocess.DEVNULL, capture_output=True, text=True
+    )
+    if res.returncode != 0:
+        errors = res.stderr.strip().splitlines()
+        raise RuntimeError(errors[-1] if errors else f"exit code {res.returncode}")
+
+    packages: dict[str, int] = {}
+    total = 0
+    # line format: 'import time: self [us] | cumulative | imported package', nested imports are indented
+    for line in res.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue
+        selfTime = int(parts[0])
+        name = parts[2].strip().split(".")[0]
+        packages[name] = packages.get(name, 0) + selfTime
+        total += selfTime
+    return total, packages
+
+
+def main(*args: str) -> int:
+    levels = [0, 1, 2, 3]
+    budget = 250.0
+    repeat = 5
+    top = 10
+    jsonPath: Optional[str] = None
+
+    index = 0
+    while index < len(args):
+        match args[index].lower():
+            case "-levels":
+                levels = [int(level.removeprefix("O").removeprefix("o")) for level in args[index + 1].split(",")]
+            case "-budget":
+                budget = float(args[index + 1])
+            case "-repeat":
+                repeat = max(1, int(args[index + 1]))
+            case "-top":
+                top = int(args[index + 1])
+            case "-json":
+                jsonPath = args[index + 1]
+        index += 2
+
+    passed = True
+    results = {}
+    for level in levels:
+        runs = [measure(level) for _ in range(repeat)]
+        # the median run, so a single slow disk access doesn't fail the budget
+        total, packages = sorted(runs, key=lambda run: run[0])[len(runs) // 2]
+        forbidden = [name for name, minLevel in FORBIDDEN.items() if level < minLevel and name in packages]
+
+        flags = ""
+        if total / 1000 > budget:
+            flags += f"  OVER BUDGET ({budget:.0f}ms)"
+            passed = False
+        if len(forbidden) > 0:
+            flags += f"  UNNEEDED: {', '.join(forbidden)}"
+            passed = False
+        print(f"O{level}: {total / 1000:8.1f}ms "
+              f"(min {min(run[0] for run in runs) / 1000:.1f}ms, "
+              f"stdev {statistics.pstdev(run[0] for run in runs) / 1000:.1f}ms){flags}")
+        for name, packageTime in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+            print(f"    {packageTime / 1000:8.1f}ms  {name}")
+
+        results[f"O{level}"] = {"total": total, "packages": packages, "forbidden": forbidden}
+
+    if jsonPath is not None:
+        with open(jsonPath, "w", encoding="UTF-8") as f:
+            json.dump({"budget": budget, "results": results}, f, indent=2)
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1::]))
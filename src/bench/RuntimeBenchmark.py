@@ -0,0 +1,256 @@
+"""
+Measure whether the code optimized by Pylang runs faster than the original.
+
+Every sample is optimized at each level, then the original and optimized versions are executed alternately in fresh
+subprocesses. Exits with 1 if a level makes a sample significantly slower, or breaks a sample which runs fine before.
+
+example:
+
+python ./src/bench/RuntimeBenchmark.py -d ./src/test -levels 0,1,2 -repeat 10
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Optional
+
+PYLANG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main", "Pylang.py")
+
+# executed in the subprocess: run the sample as __main__ and write the elapsed time to a file
+RUNNER = """
+import os, runpy, sys, time
+path, out = sys.argv[1], sys.argv[2]
+sys.argv = [path]
+sys.path.insert(0, os.path.dirname(path))
+start = time.perf_counter()
+runpy.run_path(path, run_name="__main__")
+elapsed = time.perf_counter() - start
+with open(out, "w") as f:
+    f.write(repr(elapsed))
+"""
+
+# two-sided 95% critical values of Student's t distribution, index: degrees of freedom
+T_95 = [math.inf, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+@dataclass
+class Timing:
+    samples: list[float] = field(default_factory=list)
+
+    def mean(self) -> float:
+        return statistics.fmean(self.samples)
+
+    def halfWidth(self) -> float:
+        """
+        Half width of the 95% confidence interval of the mean.
+        """
+        n = len(self.samples)
+        if n < 2:
+            return math.inf
+        t = T_95[n - 1] if n - 1 < len(T_95) else 1.960
+        return t * statistics.stdev(self.samples) / math.sqrt(n)
+
+
+@dataclass
+class Result:
+    sample: str
+    level: int
+    compileTime: Optional[float] = None
+    original: Timing = field(default_factory=Timing)
+    optimized: Timing = field(default_factory=Timing)
+    error: Optional[str] = None
+
+    def speedup(self) -> tuple[float, float, float]:
+        """
+        :return: the speedup of the optimized version, and the bounds of its 95% confidence interval.
+        """
+        orig = self.original.mean()
+        opt = self.optimized.mean()
+        speedup = orig / opt
+        relError = math.sqrt((self.original.halfWidth() / orig) ** 2 + (self.optimized.halfWidth() / opt) ** 2)
+        return speedup, speedup * max(0.0, 1 - relError), speedup * (1 + relError)
+
+    def isRegression(self, tolerance: float) -> bool:
+        if self.error is not None:
+            return True
+        return self.speedup()[2] < 1 - tolerance
+
+
+class RuntimeBenchmark:
+    def __init__(self, levels: list[int], repeat: int, timeout: float, tolerance: float):
+        self.levels = levels
+        self.repeat = repeat
+        self.timeout = timeout
+        self.tolerance = tolerance
+        self.workDir = tempfile.mkdtemp(prefix="pylang-bench-")
+        self.results: list[Result] = []
+
+    def optimize(self, sample: str, level: int) -> tuple[str, float]:
+        """
+        Optimize a sample with Pylang.
+
+        :return: the path of the optimized sample, and the transform time reported by Pylang.
+        """
+        outputDir = os.path.join(self.workDir, os.path.basename(os.path.dirname(sample)), f"O{level}")
+        start = time.perf_counter()
+        res = subprocess.run(
+            [sys.executable, os.path.abspath(PYLANG), "-f", f"./{os.path.basename(sample)}", "-o", outputDir,
+             f"-o{level}", "-info"],
+            cwd=os.path.dirname(sample), stdin=subprocess.DEVNULL, capture_output=True, text=True,
+            timeout=self.timeout
+        )
+        wallTime = time.perf_counter() - start
+        output = os.path.join(outputDir, os.path.basename(sample))
+        if res.returncode != 0 or not os.path.exists(output):
+            raise RuntimeError(f"Pylang failed: {res.stderr.strip().splitlines()[-1:] or res.returncode}")
+
+        match = re.search(r"Cost ([0-9.]+)s", res.stdout)
+        return output, float(match.group(1)) if match is not None else wallTime
+
+    def execute(self, path: str) -> float:
+        """
+        Run a script in a fresh interpreter.
+
+        :return: the time spent by the script itself, without the interpreter startup.
+        """
+        timeFile = os.path.join(self.workDir, "elapsed.txt")
+        if os.path.exists(timeFile):
+            os.remove(timeFile)
+        res = subprocess.run(
+            [sys.executable, "-c", RUNNER, path, timeFile],
+            cwd=os.path.dirname(path), stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE, text=True, timeout=self.timeout
+        )
+        if res.returncode != 0 or not os.path.exists(timeFile):
+            lines = res.stderr.strip().splitlines()
+            raise RuntimeError(lines[-1] if lines else f"exit code {res.returncode}")
+        with open(timeFile) as f:
+            return float(f.read())
+
+    def run(self, sample: str) -> None:
+        sample = os.path.abspath(sample)
+        name = os.path.relpath(sample)
+
+        try:
+            # warm up the disk cache and check the sample is runnable at all
+            self.execute(sample)
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            print(f"Skip {name}: {e}")
+            return
+
+        for level in self.levels:
+            result = Result(name, level)
+            self.results.append(result)
+            try:
+                optimized, result.compileTime = self.optimize(sample, level)
+            except (RuntimeError, subprocess.TimeoutExpired) as e:
+                result.error = f"compile: {e}"
+                continue
+
+            try:
+                self.execute(optimized)
+                # alternate the runs, so drifts of the machine affect both versions
+                for _ in range(self.repeat):
+                    result.original.samples.append(self.execute(sample))
+                    result.optimized.samples.append(self.execute(optimized))
+            except (RuntimeError, subprocess.TimeoutExpired) as e:
+                result.error = f"optimized: {e}"
+
+    def report(self) -> bool:
+        """
+        Print the results.
+
+        :return: true if no regression is found.
+        """
+        passed = True
+        print(f"{'sample':<32} {'level':>5} {'compile(s)':>10} {'original(ms)':>18} {'optimized(ms)':>18} "
+              f"{'speedup (95% CI)':>24}")
+        for result in self.results:
+            compileTime = "-" if result.compileTime is None else f"{result.compileTime:.3f}"
+            line = f"{result.sample:<32} {'O' + str(result.level):>5} {compileTime:>10} "
+            if result.error is not None:
+                line += f"{'error':>18} {result.error}"
+            else:
+                speedup, low, high = result.speedup()
+                line += (f"{result.original.mean() * 1000:>10.2f}±{result.original.halfWidth() * 1000:<7.2f} "
+                         f"{result.optimized.mean() * 1000:>10.2f}±{result.optimized.halfWidth() * 1000:<7.2f} "
+                         f"{speedup:>7.3f}x [{low:.3f}, {high:.3f}]")
+
+            if result.isRegression(self.tolerance):
+                passed = False
+                line += "  REGRESSION"
+            print(line)
+        return passed
+
+    def dump(self, path: str) -> None:
+        data = []
+        for result in self.results:
+            entry = asdict(result)
+            if result.error is None:
+                entry["speedup"] = result.speedup()
+            data.append(entry)
+        with open(path, "w", encoding="UTF-8") as f:
+            json.dump(data, f, indent=2)
+
+
+def main(*args: str) -> int:
+    samples: list[str] = []
+    levels = [0, 1, 2, 3]
+    repeat = 5
+    timeout = 600.0
+    tolerance = 0.05
+    jsonPath: Optional[str] = None
+
+    index = 0
+    while index < len(args):
+        match args[index].lower():
+            case "-f":
+                samples.append(args[index + 1])
+                index += 1
+            case "-d":
+                for root, dirs, files in os.walk(args[index + 1]):
+                    samples.extend(os.path.join(root, file) for file in sorted(files) if file.endswith(".py"))
+                index += 1
+            case "-levels":
+                levels = [int(level.removeprefix("O").removeprefix("o")) for level in args[index + 1].split(",")]
+                index += 1
+            case "-repeat":
+                repeat = max(2, int(args[index + 1]))
+                index += 1
+            case "-timeout":
+                timeout = float(args[index + 1])
+                index += 1
+            case "-tolerance":
+                tolerance = float(args[index + 1])
+                index += 1
+            case "-json":
+                jsonPath = args[index + 1]
+                index += 1
+        index += 1
+
+    if len(samples) == 0:
+        samplesDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test")
+        return main("-d", samplesDir, *args)
+
+    benchmark = RuntimeBenchmark(levels, repeat, timeout, tolerance)
+    for sample in samples:
+        benchmark.run(sample)
+
+    passed = benchmark.report()
+    if jsonPath is not None:
+        benchmark.dump(jsonPath)
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1::]))
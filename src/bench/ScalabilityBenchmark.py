@@ -0,0 +1,231 @@
+"""
+Measure how the cost of the optimizer grows with the size of the project.
+
+Each dimension of SyntheticProject is scaled while the others stay at the base value. Every data point runs
+TransManager in a fresh subprocess, and the exponent of the time/memory growth is fitted on a log-log scale, so
+super-linear hot spots stand out. Curves are plotted if matplotlib is installed.
+
+example:
+
+python ./src/bench/ScalabilityBenchmark.py -levels 1,2 -steps 1,2,4,8 -json ./out/scalability.json
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import replace, asdict
+from typing import Optional, Callable
+
+from SyntheticProject import SyntheticProject
+
+MAIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "main")
+
+BASE = SyntheticProject(files=4, functions=10, depth=2, loopDensity=0.2, constantDensity=0.5)
+# key: dimension name, value: (field of SyntheticProject, the value at a scale step, the x-axis to fit against)
+# size dimensions are fitted against the lines of code, so the exponent of a linear optimizer is 1 in all of them.
+# density dimensions barely change the lines of code, so they are fitted against the density itself.
+DIMENSIONS: dict[str, tuple[str, Callable[[int], float], str]] = {
+    "files": ("files", lambda step: BASE.files * step, "lines"),
+    "functions": ("functions", lambda step: BASE.functions * step, "lines"),
+    # the code grows exponentially with the depth
+    "depth": ("depth", lambda step: BASE.depth + int(math.log2(step)), "lines"),
+    "loops": ("loopDensity", lambda step: min(1.0, 0.05 * step), "value"),
+    "constants": ("constantDensity", lambda step: min(1.0, 0.1 * step), "value")
+}
+# fitted exponents above this are reported as super-linear
+SUPER_LINEAR = 1.2
+
+
+def peakMemory() -> Optional[int]:
+    """
+    Peak resident memory of the current process in bytes. tracemalloc is not used, as it slows the optimizer down a lot.
+
+    :return: None if it's not supported on the platform.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on the others
+    return maxRss if sys.platform == "darwin" else maxRss * 1024
+
+
+def worker(path: str, level: int) -> None:
+    """
+    Optimize a generated project in the current process, and print the costs as json.
+    """
+    sys.path.insert(0, os.path.abspath(MAIN))
+    from Pylang import Pylang
+    from log.LogLevel import LogLevel
+    from log.Logger import Logger
+    from transformers.OptimizeLevel import OptimizeLevel
+    from transformers.TransManager import TransManager
+
+    Pylang()
+    manager = TransManager(Logger(LogLevel.ERROR), OptimizeLevel(level))
+    manager.showProgress = False
+    manager.register()
+
+    start = time.perf_counter()
+    for root, dirs, files in os.walk(path):
+        for file in sorted(files):
+            manager.parse(os.path.join(root, file))
+    parsed = time.perf_counter()
+    manager.transform()
+    end = time.perf_counter()
+
+    print(json.dumps({
+        "parseTime": parsed - start,
+        "transformTime": end - parsed,
+        "peakMemory": peakMemory(),
+        "cycles": sum(manager.cycles.values())
+    }))
+
+
+def measure(project: SyntheticProject, level: int, timeout: float) -> dict:
+    with tempfile.TemporaryDirectory(prefix="pylang-scale-") as path:
+        lines = 0
+        for filepath in project.generate(path):
+            with open(filepath, encoding="UTF-8") as f:
+                lines += sum(1 for _ in f)
+        res = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "-worker", path, str(level)],
+            cwd=path, stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=timeout
+        )
+    if res.returncode != 0:
+        errors = res.stderr.strip().splitlines()
+        raise RuntimeError(errors[-1] if errors else f"exit code {res.returncode}")
+    point = json.loads(res.stdout.strip().splitlines()[-1])
+    point["lines"] = lines
+    return point
+
+
+def fitExponent(xs: list[float], ys: list[float]) -> Optional[float]:
+    """
+    Fit y = a * x^k by least squares on a log-log scale.
+
+    :return: the exponent k, or None if there's not enough data.
+    """
+    points = [(math.log(x), math.log(y)) for x, y in zip(xs, ys) if x > 0 and y > 0]
+    if len(points) < 2:
+        return None
+    meanX = sum(p[0] for p in points) / len(points)
+    meanY = sum(p[1] for p in points) / len(points)
+    var = sum((p[0] - meanX) ** 2 for p in points)
+    if var == 0:
+        return None
+    return sum((p[0] - meanX) * (p[1] - meanY) for p in points) / var
+
+
+def plot(results: dict, path: str) -> None:
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is not installed, skip plotting.")
+        return
+
+    for level, dimensions in results.items():
+        fig, axes = plt.subplots(1, 2, figsize=(12, 5))
+        for name, data in dimensions.items():
+            xs = [p[data["axis"]] for p in data["points"]]
+            axes[0].loglog(xs, [p["transformTime"] for p in data["points"]], marker="o", label=name)
+            axes[1].loglog(xs, [p["peakMemory"] or 0 for p in data["points"]], marker="o", label=name)
+        axes[0].set_title(f"{level} transform time (s)")
+        axes[1].set_title(f"{level} peak memory (bytes)")
+        for ax in axes:
+            ax.set_xlabel("lines of code / density")
+            ax.legend()
+        fig.savefig(f"{path}.{level}.png")
+        plt.close(fig)
+        print(f"Saved plot to {path}.{level}.png")
+
+
+def main(*args: str) -> int:
+    if len(args) == 3 and args[0] == "-worker":
+        worker(args[1], int(args[2]))
+        return 0
+
+    levels = [1, 2]
+    steps = [1, 2, 4, 8]
+    dimensions = list(DIMENSIONS.keys())
+    timeout = 1800.0
+    jsonPath: Optional[str] = None
+    plotPath: Optional[str] = None
+
+    index = 0
+    while index < len(args):
+        match args[index].lower():
+            case "-levels":
+                levels = [int(level.removeprefix("O").removeprefix("o")) for level in args[index + 1].split(",")]
+            case "-steps":
+                steps = [int(step) for step in args[index + 1].split(",")]
+            case "-dimensions":
+                dimensions = args[index + 1].split(",")
+            case "-timeout":
+                timeout = float(args[index + 1])
+            case "-json":
+                jsonPath = args[index + 1]
+            case "-plot":
+                plotPath = args[index + 1]
+        index += 2
+
+    results: dict[str, dict] = {}
+    superLinear = False
+    for level in levels:
+        results[f"O{level}"] = {}
+        for name in dimensions:
+            attr, scale, axis = DIMENSIONS[name]
+            points = []
+            for step in steps:
+                value = scale(step)
+                project = replace(BASE, **{attr: value})
+                try:
+                    point = measure(project, level, timeout)
+                except (RuntimeError, subprocess.TimeoutExpired) as e:
+                    print(f"O{level} {name}={value}: failed, {e}")
+                    break
+                point["value"] = value
+                points.append(point)
+                peakMemory = (point["peakMemory"] or 0) / 1024 / 1024
+                print(f"O{level} {name:>10}={value:<6} lines {point['lines']:<8} "
+                      f"transform {point['transformTime']:8.3f}s  parse {point['parseTime']:7.3f}s  "
+                      f"peak {peakMemory:8.2f}MB  cycles {point['cycles']}")
+
+            xs = [p[axis] for p in points]
+            timeExponent = fitExponent(xs, [p["transformTime"] for p in points])
+            memoryExponent = fitExponent(xs, [p["peakMemory"] or 0 for p in points])
+            results[f"O{level}"][name] = {
+                "project": asdict(BASE),
+                "field": attr,
+                "axis": axis,
+                "points": points,
+                "timeExponent": timeExponent,
+                "memoryExponent": memoryExponent
+            }
+
+            flag = ""
+            if timeExponent is not None and timeExponent > SUPER_LINEAR:
+                flag = "  SUPER-LINEAR"
+                superLinear = True
+            timeText = timeExponent if timeExponent is None else round(timeExponent, 2)
+            memoryText = memoryExponent if memoryExponent is None else round(memoryExponent, 2)
+            print(f"O{level} {name:>10}: time ~ {axis}^{timeText}, memory ~ {axis}^{memoryText}{flag}")
+
+    if jsonPath is not None:
+        with open(jsonPath, "w", encoding="UTF-8") as f:
+            json.dump(results, f, indent=2)
+    if plotPath is not None:
+        plot(results, plotPath)
+    return 1 if superLinear else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1::]))
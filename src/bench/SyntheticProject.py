@@ -0,0 +1,113 @@
+"""
+Generate synthetic Python projects to feed the optimizer, see ScalabilityBenchmark.
+
+example:
+
+python ./src/bench/SyntheticProject.py -o ./out/synthetic -files 20 -functions 100
+"""
+from __future__ import annotations
+
+import os
+import random
+import sys
+from dataclasses import dataclass
+
+
+@dataclass
+class SyntheticProject:
+    # count of modules
+    files: int = 10
+    # count of top-level functions per module
+    functions: int = 20
+    # maximum depth of nested blocks in a function
+    depth: int = 3
+    # probability of a statement to be a range loop
+    loopDensity: float = 0.2
+    # probability of an expression to be a foldable constant expression
+    constantDensity: float = 0.5
+    # count of statements per block
+    statements: int = 6
+    seed: int = 0
+
+    def generate(self, path: str) -> list[str]:
+        """
+        Write the project to a folder.
+
+        :param path: the output folder.
+        :return: paths of the generated modules.
+        """
+        rand = random.Random(self.seed)
+        os.makedirs(path, exist_ok=True)
+
+        paths = []
+        for i in range(self.files):
+            filepath = os.path.join(path, f"module_{i}.py")
+            with open(filepath, "w", encoding="UTF-8") as f:
+                f.write(self._module(rand, i))
+            paths.append(filepath)
+        return paths
+
+    def _module(self, rand: random.Random, index: int) -> str:
+        lines = [f'"""Synthetic module {index}."""', "", f"SCALE = {rand.randint(1, 9)}", ""]
+        for i in range(self.functions):
+            lines.append("")
+            lines.append(f"def func_{index}_{i}(a, b=2):")
+            lines.append(f'    """Synthetic function {i}."""')
+            lines.append("    total = 0")
+            self._block(rand, lines, 1, self.depth)
+            lines.append("    return total")
+        lines.append("")
+        return "\n".join(lines)
+
+    def _block(self, rand: random.Random, lines: list[str], indent: int, depth: int) -> None:
+        pad = "    " * indent
+        for _ in range(self.statements):
+            roll = rand.random()
+            if depth > 0 and roll < self.loopDensity:
+                var = f"i{indent}"
+                lines.append(f"{pad}for {var} in range({rand.randint(1, 8)}):")
+                lines.append(f"{pad}    total += {var}")
+                self._block(rand, lines, indent + 1, depth - 1)
+            elif depth > 0 and roll < self.loopDensity + 0.15:
+                lines.append(f"{pad}if {self._expr(rand)} > {rand.randint(0, 50)}:")
+                self._block(rand, lines, indent + 1, depth - 1)
+                lines.append(f"{pad}else:")
+                lines.append(f"{pad}    total -= 1")
+            else:
+                lines.append(f"{pad}total += {self._expr(rand)}")
+
+    def _expr(self, rand: random.Random) -> str:
+        if rand.random() < self.constantDensity:
+            return f"({rand.randint(1, 99)} * {rand.randint(1, 9)} + {rand.randint(0, 9)}) // {rand.randint(1, 5)}"
+        return rand.choice(["a", "b", "a * b", "len(str(a))", "abs(a - b)", "SCALE * a"])
+
+
+def main(*args: str) -> None:
+    project = SyntheticProject()
+    outputPath = os.path.join(".", "out", "synthetic")
+
+    index = 0
+    while index < len(args):
+        match args[index].lower():
+            case "-o":
+                outputPath = args[index + 1]
+            case "-files":
+                project.files = int(args[index + 1])
+            case "-functions":
+                project.functions = int(args[index + 1])
+            case "-depth":
+                project.depth = int(args[index + 1])
+            case "-loops":
+                project.loopDensity = float(args[index + 1])
+            case "-constants":
+                project.constantDensity = float(args[index + 1])
+            case "-seed":
+                project.seed = int(args[index + 1])
+        index += 2
+
+    paths = project.generate(outputPath)
+    print(f"Generated {len(paths)} modules in {outputPath}.")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1::])
@@ -11,5 +11,27 @@ pylang: Pylang
 transManager: TransManager
 logger: Logger
 
+VERSION = "0.0.1"
+
 # TODO We should make them into the optimize config file
 LOOP_UNFOLDING_MAX_LINES = 1000
+CACHE_MAX_SIZE = 256 * 1024 * 1024
+MMAP_THRESHOLD = 16 * 1024 * 1024
+# records waiting for the background log writer, logging blocks when it's full
+LOG_QUEUE_SIZE = 4096
+LOG_BATCH_SIZE = 256
+# limits of the general transform of a single module, no limit if 0. see Watchdog
+MAX_TRANSFORM_TIME = 60.0
+MAX_TRANSFORM_CYCLES = 100
+# limits of evaluating constants while folding, see EvalBudget
+FOLD_MAX_SIZE = 1024 * 1024
+FOLD_MAX_COST = 10_000_000
+# folded values larger than this aren't written to the output, but still fold the expressions using them
+FOLD_MAX_LITERAL_SIZE = 4096
+# the subprocesses evaluating calls to the standard library while folding, see Sandbox
+SANDBOX_WORKERS = 2
+SANDBOX_TIMEOUT = 2.0
+SANDBOX_MEMORY = 512 * 1024 * 1024
+SANDBOX_CACHE_SIZE = 4096
+# the max length of a literal copied to every load of its variable, see ConstantPropagation
+PROPAGATION_MAX_SIZE = 64
@@ -12,6 +12,11 @@ from log.LogLevel import LogLevel
 from log.Logger import Logger
 from transformers.OptimizeLevel import OptimizeLevel
 from transformers.TransManager import TransManager
+from utils.Profiler import Profiler
+from utils.cache.TransCache import TransCache
+from utils.source.OutputWriter import OutputWriter
+from utils.source.Source import Source
+from utils.source.SourceLoader import SourceLoader
 
 
 class Pylang:
@@ -26,9 +31,25 @@ class Pylang:
         logToFile = False
         filenames: list[str] = ObjectArrayList()
         outputPath: str = r".\out"
+        jobs = 1
+        cachePath: Optional[str] = None
+        cacheSize = Const.CACHE_MAX_SIZE
+        profilePath: Optional[str] = None
+        profileMemory = False
+        profileTop = 20
+        compileBytecode = False
+        keepStale = False
+        stream = False
+        zipappPath: Optional[str] = None
+        maxTime = Const.MAX_TRANSFORM_TIME
+        maxCycles = Const.MAX_TRANSFORM_CYCLES
+        # run as a server, see PylangServer
+        serve = len(args) > 0 and args[0].lower() == "serve"
+        socketPath: Optional[str] = None
+        port: Optional[int] = None
 
         try:
-            index = 0
+            index = 1 if serve else 0
             while index < len(args):
                 arg = args[index].lower()
                 match arg:
@@ -66,6 +87,44 @@ class Pylang:
                     case "-compiler":
                         self.compilerPath = args[index + 1]
                         index += 1
+                    case "-cache":
+                        cachePath = args[index + 1]
+                        index += 1
+                    case "-cachesize":
+                        cacheSize = int(args[index + 1]) * 1024 * 1024
+                        index += 1
+                    case "-profile":
+                        profilePath = args[index + 1]
+                        index += 1
+                    case "-profilemem":
+                        profileMemory = True
+                    case "-profiletop":
+                        profileTop = int(args[index + 1])
+                        index += 1
+                    case "-stream":
+                        stream = True
+                    case "-keepstale":
+                        keepStale = True
+                    case "-pyc":
+                        compileBytecode = True
+                    case "-zipapp":
+                        zipappPath = args[index + 1]
+                        index += 1
+                    case "-timeout":
+                        maxTime = max(0.0, float(args[index + 1]))
+                        index += 1
+                    case "-maxcycles":
+                        maxCycles = max(0, int(args[index + 1]))
+                        index += 1
+                    case "-j":
+                        jobs = max(1, int(args[index + 1]))
+                        index += 1
+                    case "-socket":
+                        socketPath = args[index + 1]
+                        index += 1
+                    case "-port":
+                        port = int(args[index + 1])
+                        index += 1
                 index += 1
         except IndexError:
             pass
@@ -74,23 +133,86 @@ class Pylang:
             print(e)
             exit(1)
 
+        if serve:
+            from server.PylangServer import PylangServer
+            PylangServer(logLevel, jobs, cacheSize, maxTime, maxCycles).serve(socketPath, port)
+            return
+
         logger = Logger(logLevel, open("latest.log", "w") if logToFile else None)
-        manager = TransManager(logger, level)
+        manager = TransManager(logger, level, jobs)
+        manager.watchdog.maxTime = maxTime
+        manager.watchdog.maxCycles = maxCycles
+        if cachePath is not None:
+            manager.cache = TransCache(cachePath, cacheSize)
+        if profilePath is not None:
+            manager.profiler = Profiler(profileMemory)
         manager.register()
 
+        filenames = [filename for filename in filenames if filename.endswith(".py")]
+        writer = OutputWriter(outputPath, logger, keepStale)
+
+        if stream:
+            if zipappPath is not None or jobs > 1:
+                logger.warn("-zipapp and -j are not supported with -stream, ignored.")
+            writer.start()
+            manager.transformStream(filenames, writer, compileBytecode)
+            writer.finish()
+            if manager.profiler is not None:
+                self.saveProfile(manager, profilePath, profileTop, level=level.name, jobs=1)
+            return
+
         logger.debug("Start parsing files.")
-        for filename in filenames:
-            if not filename.endswith(".py"):
-                continue
-            manager.parse(filename)
+        for source in SourceLoader.readAll(filenames):
+            manager.parseSource(source)
         logger.info(f"Parsed {len(manager.sources)} files.")
+        if manager.cache is not None:
+            logger.info(f"Reused {manager.cache.hits} cached files.")
 
         output = manager.transform()
-        for source in output:
-            path = (outputPath + source.getFilepath()[1::]).replace("\\", "/")
-            logger.debug(f"Write to {Fore.CYAN}{path}")
-            os.makedirs(os.path.dirname(path), exist_ok=True)
-            source.writeToFile(path)
+
+        if manager.profiler is not None:
+            self.saveProfile(manager, profilePath, profileTop, level=level.name, jobs=jobs,
+                             cycles={source.getFilepath(): cycle for source, cycle in manager.cycles.items()})
+
+        if compileBytecode:
+            output = manager.compileSources()
+
+        writer.write(output)
+
+        if zipappPath is not None:
+            self.writeZipApp(output, zipappPath, logger)
+
+    @staticmethod
+    def saveProfile(manager: TransManager, path: str, top: int, **meta) -> None:
+        manager.profiler.report(manager.logger, top)
+        manager.profiler.dump(path, **meta)
+        manager.logger.info(f"Profile saved to {Fore.CYAN}{path}")
+
+    @staticmethod
+    def writeZipApp(sources: list[Source], path: str, logger: Logger) -> None:
+        """
+        Pack the sources into a single archive, which is runnable by 'python <path>' if it contains a __main__ module.
+
+        :param sources: the sources to pack, placed like in the output folder.
+        :param path: the archive file.
+        """
+        import zipfile
+
+        names = set()
+        dirname = os.path.dirname(path)
+        if dirname != "":
+            os.makedirs(dirname, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"#!/usr/bin/env python3\n")
+            with zipfile.ZipFile(f, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                for source in sources:
+                    name = source.getFilepath()[1::].replace("\\", "/").lstrip("/")
+                    archive.writestr(name, source.toBytes())
+                    names.add(name)
+
+        logger.info(f"Packed {len(names)} files into {Fore.CYAN}{path}")
+        if "__main__.py" not in names and "__main__.pyc" not in names:
+            logger.warn("There's no __main__ module at the root of the archive, it can't be run directly.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from ast import Module
+from importlib.abc import MetaPathFinder
+from importlib.machinery import PathFinder, SourceFileLoader, ModuleSpec
+from typing import Optional, Sequence, TYPE_CHECKING
+
+import Const
+from importer.PylangLoader import PylangLoader
+from log.LogLevel import LogLevel
+from transformers.OptimizeLevel import OptimizeLevel
+from utils.source.CodeSource import CodeSource
+
+if TYPE_CHECKING:
+    from log.Logger import Logger
+    from transformers.TransManager import TransManager
+
+# the folder of Pylang itself, never optimized by the finder
+MAIN = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class PylangFinder(MetaPathFinder):
+    """
+    Optimize python modules when they are imported for the first time, see PylangLoader.
+    The optimizer is loaded on the first cache miss, warm starts only pay for hashing the sources.
+
+    example:
+
+    PylangFinder.install(OptimizeLevel.O2, ["./myproject"])
+    import myproject
+    """
+
+    def __init__(self, level: OptimizeLevel, paths: Sequence[str], logLevel: LogLevel = LogLevel.ERROR):
+        """
+        :param level: the optimize level, O3 is lowered to O2 as compiling native code at import time is too slow.
+        :param paths: only the modules in these folders are optimized.
+        :param logLevel: the level of the messages printed while optimizing.
+        """
+        self.level = min(level, OptimizeLevel.O2)
+        self.paths = tuple(os.path.join(os.path.abspath(path), "") for path in paths)
+        self.logLevel = logLevel
+        self.logger: Optional[Logger] = None
+        self.manager: Optional[TransManager] = None
+        # the transformers may import modules while transforming, only skipped in the transforming thread
+        self.__local = threading.local()
+        # the manager and the Const globals are shared, a module is transformed at a time
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def install(level: OptimizeLevel = OptimizeLevel.O1, paths: Optional[Sequence[str]] = None,
+                logLevel: LogLevel = LogLevel.ERROR) -> PylangFinder:
+        """
+        Insert a finder to the front of sys.meta_path.
+
+        :param level: the optimize level.
+        :param paths: only the modules in these folders are optimized, defaults to the working directory.
+        :param logLevel: the level of the messages printed while optimizing.
+        :return: the installed finder.
+        """
+        finder = PylangFinder(level, paths if paths is not None else [os.getcwd()], logLevel)
+        sys.meta_path.insert(0, finder)
+        return finder
+
+    def uninstall(self) -> None:
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname: str, path: Optional[Sequence[str]] = None, target=None) -> Optional[ModuleSpec]:
+        if getattr(self.__local, "transforming", False):
+            return None
+
+        spec = PathFinder.find_spec(fullname, path, target)
+        if spec is None or not isinstance(spec.loader, SourceFileLoader) or spec.origin is None:
+            return None
+        origin = os.path.abspath(spec.origin)
+        if not origin.startswith(self.paths) or origin.startswith(os.path.join(MAIN, "")):
+            return None
+
+        spec.loader = PylangLoader(fullname, spec.origin, self)
+        return spec
+
+    def transform(self, source: CodeSource) -> Optional[Module]:
+        """
+        Optimize a single module.
+
+        :return: the optimized module, or None if the module is skipped.
+        """
+        with self.__lock:
+            self.__local.transforming = True
+            try:
+                return self.__transform(source)
+            finally:
+                self.__local.transforming = False
+
+    def __transform(self, source: CodeSource) -> Optional[Module]:
+        if self.manager is None:
+            from log.Logger import Logger
+            from transformers.TransManager import TransManager
+            if not hasattr(Const, "pylang"):
+                from Pylang import Pylang
+                Pylang()
+            self.logger = Logger(self.logLevel)
+            self.manager = TransManager(self.logger, self.level)
+            self.manager.showProgress = False
+            self.manager.register()
+        Const.transManager = self.manager
+        Const.logger = self.logger
+
+        manager = self.manager
+        manager.reset()
+        manager.parseSource(source)
+        if source not in manager.modules:
+            return None
+        manager.transformGeneral()
+        manager.transformPost()
+        return manager.modules[source]
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import importlib.util
+import marshal
+import sys
+from importlib.machinery import SourceFileLoader
+from types import CodeType
+from typing import TYPE_CHECKING, Optional
+
+from utils.cache.Fingerprint import Fingerprint
+from utils.source.CodeSource import CodeSource
+
+if TYPE_CHECKING:
+    from importer.PylangFinder import PylangFinder
+
+
+class PylangLoader(SourceFileLoader):
+    """
+    Load a module with the code optimized by the finder's TransManager.
+
+    The optimized code object is cached as a hash-based pyc in __pycache__, named like
+    'module.cpython-312.opt-pylangO2.pyc', so it never collides with the normal pyc files.
+    """
+    # PEP 552 flags: hash based, checked
+    FLAGS = 0b11
+
+    def __init__(self, fullname: str, path: str, finder: PylangFinder):
+        super().__init__(fullname, path)
+        self.finder = finder
+
+    def cachePath(self) -> str:
+        return importlib.util.cache_from_source(self.path, optimization=f"pylang{self.finder.level.name}")
+
+    def sourceHash(self, data: bytes) -> bytes:
+        # the result also depends on the optimizer itself, and the level is in the cache path
+        return importlib.util.source_hash(Fingerprint.get() + b"\0" + data)
+
+    def loadCache(self, cachePath: str, sourceHash: bytes) -> Optional[CodeType]:
+        try:
+            data = self.get_data(cachePath)
+        except OSError:
+            return None
+        if (len(data) < 16 or data[:4] != importlib.util.MAGIC_NUMBER
+                or int.from_bytes(data[4:8], "little") != PylangLoader.FLAGS or data[8:16] != sourceHash):
+            return None
+        try:
+            return marshal.loads(data[16:])
+        except (EOFError, ValueError, TypeError):
+            return None
+
+    def get_code(self, fullname: str) -> Optional[CodeType]:
+        data = self.get_data(self.path)
+        cachePath = self.cachePath()
+        sourceHash = self.sourceHash(data)
+
+        code = self.loadCache(cachePath, sourceHash)
+        if code is not None:
+            return code
+
+        code = None
+        try:
+            module = self.finder.transform(CodeSource(self.path, importlib.util.decode_source(data)))
+            if module is not None:
+                code = compile(module, self.path, "exec", dont_inherit=True)
+        except Exception as e:
+            # never break an import, fall back to the original code
+            if self.finder.logger is not None:
+                self.finder.logger.warn(f"Failed to optimize {self.path}: {type(e).__name__}: {e}")
+
+        if code is None:
+            # cached like an optimized result, so a module which can't be optimized isn't transformed on every import.
+            # the hash covers the optimizer, a fixed Pylang tries again
+            code = self.source_to_code(data, self.path)
+
+        if not sys.dont_write_bytecode:
+            header = importlib.util.MAGIC_NUMBER + PylangLoader.FLAGS.to_bytes(4, "little") + sourceHash
+            try:
+                self.set_data(cachePath, header + marshal.dumps(code))
+            except OSError:
+                pass
+        return code
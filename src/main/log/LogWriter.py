@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import atexit
+import sys
+import threading
+import time
+from queue import Queue, Empty
+from typing import TextIO, Optional
+
+from colorama import Style
+
+import Const
+from log.LogLevel import LogLevel
+
+
+class LogWriter:
+    """
+    Write log records to a file in a background thread, so logging never waits for the disk.
+
+    The records are written in batches with a single write call. The queue is bounded, a logger producing records
+    faster than they are written is blocked instead of using unbounded memory.
+    Records which can't be written, like when the disk is full, are dropped, logging never fails or hangs.
+    """
+
+    def __init__(self, file: TextIO, maxSize: int = Const.LOG_QUEUE_SIZE, batchSize: int = Const.LOG_BATCH_SIZE):
+        """
+        :param file: the file to write to, closed by close.
+        :param maxSize: the max count of records waiting to be written.
+        :param batchSize: the max count of records written at once.
+        """
+        self.file = file
+        self.batchSize = batchSize
+        # (time, level, color, message), None to stop the writer
+        self.__queue: Queue[Optional[tuple[float, LogLevel, str, str]]] = Queue(maxSize)
+        self.__closed = False
+        # the first error writing the file, reported once
+        self.__error: Optional[BaseException] = None
+        self.__thread = threading.Thread(target=self.__run, name="LogWriter", daemon=True)
+        self.__thread.start()
+        # the thread is a daemon, write the records left before the interpreter exits
+        atexit.register(self.close)
+
+    def put(self, level: LogLevel, color: str, message: str) -> None:
+        record = time.time(), level, color, message
+        if self.__closed or not self.__thread.is_alive():
+            # nobody takes records from the queue anymore, it would block once full
+            self.__write([record])
+            return
+        self.__queue.put(record)
+
+    def close(self) -> None:
+        """
+        Write all waiting records and close the file.
+        """
+        if self.__closed:
+            return
+        self.__closed = True
+        if self.__thread.is_alive():
+            self.__queue.put(None)
+            self.__thread.join()
+        try:
+            self.file.close()
+        except OSError:
+            pass
+        atexit.unregister(self.close)
+
+    def __run(self) -> None:
+        queue = self.__queue
+        running = True
+        while running:
+            records = [queue.get()]
+            try:
+                while len(records) < self.batchSize:
+                    records.append(queue.get_nowait())
+            except Empty:
+                pass
+
+            if None in records:
+                running = False
+                records = records[:records.index(None)]
+            self.__write(records)
+
+    def __write(self, records: list[tuple[float, LogLevel, str, str]]) -> None:
+        lines = []
+        lastSecond = -1
+        timeStr = ""
+        for recordTime, level, color, message in records:
+            if int(recordTime) != lastSecond:
+                lastSecond = int(recordTime)
+                timeStr = time.strftime("%H:%M:%S", time.localtime(recordTime))
+            lines.append(f"{color}[{timeStr}] [{level.name}]: {message}{Style.RESET_ALL}\n")
+        try:
+            self.file.write("".join(lines))
+            self.file.flush()
+        except (OSError, ValueError) as e:
+            # ValueError if the file is closed
+            if self.__error is None:
+                self.__error = e
+                print(f"Failed to write the log, records are dropped: {type(e).__name__}: {e}", file=sys.stderr)
@@ -1,42 +1,60 @@
 import sys
 import time
-from typing import TextIO
+from typing import TextIO, Optional, Callable, Union
 
 import tqdm
 import colorama
 from colorama import Fore, Style
+from pyfastutil.objects import ObjectArrayList
 
 import Const
 from log.LogLevel import LogLevel
+from log.LogWriter import LogWriter
 
 # Initialize colorama
 colorama.init(autoreset=True)
 
+# a message part, callables are only called if the message is logged
+Message = Union[object, Callable[[], object]]
+
 
 class Logger:
     UNDERLINE = "\033[4m"
     RESET = "\033[0m"
 
-    def __init__(self, level: LogLevel, file: TextIO | None = None):
+    def __init__(self, level: LogLevel, file: TextIO | None = None, capture: bool = False):
         """
         Initialize the Logger with a log level and an optional output file.
 
         :param level: The minimum log level for messages to be logged.
-        :param file: The file to which logs will be written. Defaults to stdout if None.
+        :param file: The file to which logs will be written in a background thread, see LogWriter.
+                     Defaults to stdout if None.
+        :param capture: Keep messages in memory instead of writing them, see popRecords.
         """
         Const.logger = self
         self.level = level
         self.__file = file
+        self.__writer: Optional[LogWriter] = LogWriter(file) if file is not None and not capture else None
+        self.__records: Optional[list[tuple[LogLevel, str]]] = ObjectArrayList() if capture else None
 
     def __del__(self):
         """
         Destructor to ensure the file is closed if it was opened.
         """
+        self.close()
+
+    def close(self) -> None:
+        """
+        Write the pending messages and close the file if it was opened.
+        """
+        if self.__writer is not None:
+            self.__writer.close()
+            self.__writer = None
         if (self.__file is not None) and (not self.__file.closed):
             self.__file.close()
-            self.__file = None
+        self.__file = None
 
-    def debug(self, *message: object) -> None:
+    def debug(self, *message: Message) -> None:
         """
         Log a debug message.
 
@@ -44,7 +62,7 @@ class Logger:
         """
         self.log(LogLevel.DEBUG, *message)
 
-    def info(self, *message: object) -> None:
+    def info(self, *message: Message) -> None:
         """
         Log an info message.
 
@@ -52,7 +70,7 @@ class Logger:
         """
         self.log(LogLevel.INFO, *message)
 
-    def warn(self, *message: object) -> None:
+    def warn(self, *message: Message) -> None:
         """
         Log a warning message.
 
@@ -60,7 +78,7 @@ class Logger:
         """
         self.log(LogLevel.WARN, *message)
 
-    def error(self, *message: object) -> None:
+    def error(self, *message: Message) -> None:
         """
         Log an error message.
 
@@ -68,7 +86,7 @@ class Logger:
         """
         self.log(LogLevel.ERROR, *message)
 
-    def critical(self, *message: object) -> None:
+    def critical(self, *message: Message) -> None:
         """
         Log a critical message.
 
@@ -76,25 +94,62 @@ class Logger:
         """
         self.log(LogLevel.CRITICAL, *message)
 
-    def log(self, level: LogLevel, *message: object) -> None:
+    def isEnabled(self, level: LogLevel) -> bool:
+        """
+        Check if messages of a level are logged, to skip building messages which would be dropped.
+
+        :param level: The log level to check.
+        :return: True if the messages of the level are logged.
+        """
+        return level >= self.level
+
+    def log(self, level: LogLevel, *message: Message) -> None:
         """
         Log a message at a specified log level with color.
 
         :param level: The log level of the message.
-        :param message: The message(s) to log.
+        :param message: The message(s) to log, joined together. Expensive messages should be passed as
+                        callables, like 'lambda: ast.dump(node)', they are only called if the level is logged.
         """
-        if level >= self.level:
-            out = self.getOutput()
-            timeStr = time.strftime("%H:%M:%S", time.localtime())
+        if level < self.level:
+            return
+        text = "".join(str(msg() if callable(msg) else msg) for msg in message)
+
+        if self.__records is not None:
+            self.__records.append((level, text))
+            return
 
-            # Select color based on log level
-            color = self._getColor(level)
+        # Select color based on log level
+        color = self._getColor(level)
 
-            with tqdm.tqdm.external_write_mode(file=None, nolock=True):
-                out.write(f"{color}[{timeStr}] [{level.name}]: ")
-                for msg in message:
-                    out.write(str(msg))
-                out.write(Style.RESET_ALL + "\n")
+        if self.__writer is not None:
+            self.__writer.put(level, color, text)
+            return
+
+        out = self.getOutput()
+        timeStr = time.strftime("%H:%M:%S", time.localtime())
+        with tqdm.tqdm.external_write_mode(file=None, nolock=True):
+            out.write(f"{color}[{timeStr}] [{level.name}]: {text}{Style.RESET_ALL}\n")
+
+    def popRecords(self) -> list[tuple[LogLevel, str]]:
+        """
+        Take all captured messages, only available if the logger is created with capture.
+
+        :return: The captured (level, message) pairs in logging order.
+        """
+        assert self.__records is not None
+        records = self.__records.to_list()
+        self.__records.clear()
+        return records
+
+    def replay(self, records: list[tuple[LogLevel, str]]) -> None:
+        """
+        Log messages captured by another logger, usually one living in a worker process.
+
+        :param records: The (level, message) pairs returned by popRecords.
+        """
+        for level, message in records:
+            self.log(level, message)
 
     def getOutput(self) -> TextIO:
         """
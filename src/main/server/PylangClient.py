@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import socket
+from typing import Optional, Any
+
+from server.PylangServer import PylangServer
+
+
+class PylangClient:
+    """
+    Talk to a running PylangServer, for integrations written in python.
+    Relative paths passed to optimize are resolved against the working directory of the client.
+
+    example:
+
+    with PylangClient() as client:
+        code = client.call("optimize", files=["./main.py"], level="O2")["sources"]
+    """
+
+    def __init__(self, socketPath: Optional[str] = None, port: Optional[int] = None, timeout: Optional[float] = None):
+        """
+        :param socketPath: the path of the Unix socket, defaults to the one used by the server.
+        :param port: connect to this local TCP port instead of a Unix socket.
+        :param timeout: the timeout of every request in seconds, no timeout if None.
+        """
+        if port is not None:
+            self.__socket = socket.create_connection(("127.0.0.1", port), timeout)
+        else:
+            self.__socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.__socket.settimeout(timeout)
+            self.__socket.connect(socketPath or PylangServer.defaultSocket())
+        self.__file = self.__socket.makefile("rwb")
+        self.__ids = itertools.count(1)
+
+    def call(self, method: str, **params: Any) -> Any:
+        """
+        Send a request and wait for the response.
+
+        :param method: the method name, see PylangServer.
+        :param params: the params of the method.
+        :return: the result of the method.
+        :raise RuntimeError: if the server responds an error.
+        """
+        if method == "optimize":
+            params.setdefault("cwd", os.getcwd())
+        request = {"jsonrpc": "2.0", "id": next(self.__ids), "method": method, "params": params}
+        self.__file.write(json.dumps(request).encode("UTF-8") + b"\n")
+        self.__file.flush()
+
+        line = self.__file.readline()
+        if len(line) == 0:
+            raise ConnectionError("The server closed the connection.")
+        response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError(f"{response['error']['message']} ({response['error']['code']})")
+        return response["result"]
+
+    def close(self) -> None:
+        self.__file.close()
+        self.__socket.close()
+
+    def __enter__(self) -> PylangClient:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import json
+import os
+import socket
+import socketserver
+import stat
+import tempfile
+import time
+from concurrent.futures import Executor
+from typing import Optional, Any
+
+from colorama import Fore
+
+import Const
+from log.LogLevel import LogLevel
+from log.Logger import Logger
+from transformers.OptimizeLevel import OptimizeLevel
+from transformers.TransManager import TransManager
+from utils.cache.MemoryCache import MemoryCache
+from utils.source.CodeSource import CodeSource
+
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class PylangServer:
+    """
+    Long-running optimizer, started by 'Pylang.py serve'.
+
+    Requests are newline-delimited JSON-RPC 2.0 objects sent over a Unix socket, or a local TCP port if asked for.
+    The TCP port isn't authenticated, any local user may read and write files as the user running the server.
+    A registered TransManager is kept per optimize level, and parsed ASTs and transformed results are
+    kept in memory, so a request only pays for the modules changed since the last one.
+
+    methods:
+        optimize(files?, dirs?, level?, output?, root?, returnSources?, cwd?): transform the files.
+        stats(): cache and request counters.
+        reset(): drop the cached ASTs and results.
+        shutdown(): stop the server.
+    """
+    # JSON-RPC error codes
+    PARSE_ERROR = -32700
+    INVALID_REQUEST = -32600
+    METHOD_NOT_FOUND = -32601
+    INVALID_PARAMS = -32602
+    INTERNAL_ERROR = -32603
+
+    def __init__(self, logLevel: LogLevel, jobs: int = 1, cacheSize: int = Const.CACHE_MAX_SIZE,
+                 maxTime: float = Const.MAX_TRANSFORM_TIME, maxCycles: int = Const.MAX_TRANSFORM_CYCLES):
+        """
+        :param logLevel: the level of the messages printed.
+        :param jobs: the count of worker processes, transform in the server process if 1.
+        :param cacheSize: the approximate maximum size of the cached ASTs and results in bytes.
+        :param maxTime: the max seconds spent on a module, see Watchdog.
+        :param maxCycles: the max general transform cycles of a module, see Watchdog.
+        """
+        # print the server's own messages, and the messages of every request after it's done
+        self.logger = Logger(logLevel)
+        # transformers keep the logger created last, their messages are returned to the client
+        self.captureLogger = Logger(logLevel, capture=True)
+        self.jobs = jobs
+        self.maxTime = maxTime
+        self.maxCycles = maxCycles
+        self.cache = MemoryCache(cacheSize)
+        self.managers: dict[OptimizeLevel, TransManager] = {}
+        # the worker processes if jobs > 1, started on the first request and shared by the managers of all levels
+        self.executor: Optional[Executor] = None
+        self.requests = 0
+        self.startTime = time.time()
+        self.running = False
+
+    @staticmethod
+    def defaultSocket() -> str:
+        return os.path.join(tempfile.gettempdir(), f"pylang-{os.getuid() if hasattr(os, 'getuid') else 0}.sock")
+
+    @staticmethod
+    def isSocket(path: str) -> bool:
+        try:
+            return stat.S_ISSOCK(os.lstat(path).st_mode)
+        except OSError:
+            return False
+
+    def getManager(self, level: OptimizeLevel) -> TransManager:
+        manager = self.managers.get(level)
+        if manager is None:
+            manager = TransManager(self.captureLogger, level, self.jobs)
+            manager.showProgress = False
+            manager.cache = self.cache
+            manager.watchdog.maxTime = self.maxTime
+            manager.watchdog.maxCycles = self.maxCycles
+            if self.jobs > 1:
+                if self.executor is None:
+                    self.executor = manager.createExecutor(self.jobs)
+                manager.executor = self.executor
+            manager.register()
+            self.logger.replay(self.captureLogger.popRecords())
+            self.managers[level] = manager
+            self.logger.debug(f"Created the transform manager of level {level.name}.")
+        # transformers find the manager by Const
+        Const.transManager = manager
+        manager.reset()
+        # every request reports its own warnings
+        manager.flagged.clear()
+        return manager
+
+    def optimize(self, files: Optional[list[str]] = None, dirs: Optional[list[str]] = None, level: str = "O1",
+                 output: Optional[str] = None, root: Optional[str] = None,
+                 returnSources: bool = True, cwd: Optional[str] = None) -> dict[str, Any]:
+        """
+        Transform the files like the command line does.
+
+        :param files: paths of the python files.
+        :param dirs: folders to search python files in.
+        :param level: the optimize level, like 'O2'.
+        :param output: the folder to write the results to, nothing is written if None.
+        :param root: the results are written to the same relative path to output as the file to root.
+                     Defaults to the common folder of all files.
+        :param returnSources: return the transformed code of every file.
+        :param cwd: the working directory of the client, relative paths are rejected without it.
+        """
+        try:
+            optimizeLevel = OptimizeLevel[level.upper()]
+        except KeyError:
+            raise RpcError(PylangServer.INVALID_PARAMS, f"Unknown optimize level '{level}'.")
+
+        if cwd is not None and not os.path.isabs(cwd):
+            raise RpcError(PylangServer.INVALID_PARAMS, f"The cwd '{cwd}' must be an absolute path.")
+
+        def resolve(path: str) -> str:
+            # the server's own working directory has nothing to do with the client's
+            if os.path.isabs(path):
+                return os.path.normpath(path)
+            if cwd is None:
+                raise RpcError(PylangServer.INVALID_PARAMS, f"The path '{path}' is relative, but no cwd is given.")
+            return os.path.normpath(os.path.join(cwd, path))
+
+        output = None if output is None else resolve(output)
+        root = None if root is None else resolve(root)
+        filenames = [resolve(file) for file in files or []]
+        for folder in map(resolve, dirs or []):
+            for dirRoot, _, dirFiles in os.walk(folder):
+                filenames.extend(os.path.join(dirRoot, file) for file in sorted(dirFiles))
+        filenames = [filename for filename in filenames if filename.endswith(".py")]
+        if len(filenames) == 0:
+            raise RpcError(PylangServer.INVALID_PARAMS, "No python file to optimize.")
+
+        startTime = time.perf_counter()
+        hits = self.cache.hits
+        manager = self.getManager(optimizeLevel)
+        for filename in filenames:
+            manager.parse(filename)
+        reused = self.cache.hits - hits
+        sources = manager.transform()
+        evicted = self.cache.evict()
+
+        written = []
+        if output is not None:
+            if root is None:
+                root = os.path.commonpath([os.path.dirname(filename) for filename in filenames])
+            for source in sources:
+                path = os.path.join(output, os.path.relpath(source.getFilepath(), root))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                source.writeToFile(path)
+                written.append(path)
+
+        result: dict[str, Any] = {
+            "files": len(filenames),
+            "reused": reused,
+            "evicted": evicted,
+            "time": time.perf_counter() - startTime,
+            "written": written,
+            # generated sources which aren't python code, like native libraries
+            "generated": [source.getFilepath() for source in sources if not isinstance(source, CodeSource)]
+        }
+        if returnSources:
+            result["sources"] = {source.getFilepath(): source.getSources()
+                                 for source in sources if isinstance(source, CodeSource)}
+        return result
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "version": Const.VERSION,
+            "uptime": time.time() - self.startTime,
+            "requests": self.requests,
+            "levels": [level.name for level in self.managers.keys()],
+            "cacheEntries": len(self.cache),
+            "cacheSize": self.cache.size,
+            "cacheHits": self.cache.hits,
+            "cacheMisses": self.cache.misses
+        }
+
+    def reset(self) -> dict[str, Any]:
+        self.cache.clear()
+        return {}
+
+    def shutdown(self) -> dict[str, Any]:
+        self.running = False
+        return {}
+
+    def dispatch(self, line: bytes) -> Optional[dict[str, Any]]:
+        """
+        Handle a single request.
+
+        :param line: the json request.
+        :return: the json response, or None if the request is a notification.
+        """
+        requestId = None
+        notification = False
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                raise RpcError(PylangServer.PARSE_ERROR, str(e))
+            if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+                raise RpcError(PylangServer.INVALID_REQUEST, "Invalid request.")
+            requestId = request.get("id")
+            notification = "id" not in request
+
+            method = request["method"]
+            if method not in ("optimize", "stats", "reset", "shutdown"):
+                raise RpcError(PylangServer.METHOD_NOT_FOUND, f"Method '{method}' not found.")
+            params = request.get("params") or {}
+            if not isinstance(params, dict):
+                raise RpcError(PylangServer.INVALID_PARAMS, "Params must be an object.")
+
+            self.requests += 1
+            try:
+                result = getattr(self, method)(**params)
+            except TypeError as e:
+                raise RpcError(PylangServer.INVALID_PARAMS, str(e))
+            finally:
+                records = self.captureLogger.popRecords()
+                self.logger.replay(records)
+
+            if method == "optimize":
+                result["logs"] = [{"level": level.name, "message": message} for level, message in records]
+            response = {"jsonrpc": "2.0", "id": requestId, "result": result}
+        except RpcError as e:
+            response = {"jsonrpc": "2.0", "id": requestId, "error": {"code": e.code, "message": str(e)}}
+        except Exception as e:
+            self.logger.error(f"Failed to handle the request: {type(e).__name__}: {e}")
+            response = {"jsonrpc": "2.0", "id": requestId,
+                        "error": {"code": PylangServer.INTERNAL_ERROR, "message": f"{type(e).__name__}: {e}"}}
+
+        if notification:
+            return None
+        return response
+
+    def serve(self, socketPath: Optional[str] = None, port: Optional[int] = None) -> None:
+        """
+        Handle requests one by one until shutdown.
+
+        :param socketPath: the path of the Unix socket.
+        :param port: listen on this local TCP port instead of a Unix socket.
+        """
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if len(line.strip()) == 0:
+                        continue
+                    response = server.dispatch(line)
+                    if response is not None:
+                        self.wfile.write(json.dumps(response).encode("UTF-8") + b"\n")
+                        self.wfile.flush()
+                    if not server.running:
+                        return
+
+        if port is None and not hasattr(socket, "AF_UNIX"):
+            self.logger.error("Unix sockets aren't supported by this platform, pass -port to listen on a TCP port.")
+            return
+
+        if port is not None:
+            socketServer = socketserver.TCPServer(("127.0.0.1", port), Handler)
+            address = f"127.0.0.1:{port}"
+            self.logger.warn("The TCP port isn't authenticated, every local user can optimize, read and write files "
+                             "as you through it.")
+        else:
+            socketPath = socketPath or PylangServer.defaultSocket()
+            if os.path.lexists(socketPath):
+                if not PylangServer.isSocket(socketPath):
+                    self.logger.error(f"{socketPath} exists and isn't a socket, refuse to replace it.")
+                    return
+                # left by a server which didn't stop cleanly
+                os.remove(socketPath)
+            socketServer = socketserver.UnixStreamServer(socketPath, Handler)
+            address = socketPath
+
+        self.running = True
+        self.logger.info(f"Pylang server is listening on {Fore.CYAN}{address}")
+        try:
+            with socketServer:
+                while self.running:
+                    socketServer.handle_request()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if port is None and PylangServer.isSocket(socketPath):
+                os.remove(socketPath)
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+        self.logger.info(f"Pylang server stopped after {self.requests} requests.")
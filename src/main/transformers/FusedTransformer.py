@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from ast import NodeTransformer, AST
+from typing import Callable, TYPE_CHECKING, Optional
+
+from utils.NodeTypeIndex import NodeTypeIndex
+
+if TYPE_CHECKING:
+    from transformers.ITransformer import ITransformer
+
+
+class FusedTransformer(NodeTransformer):
+    """
+    Run several transformers in a single traversal.
+    The visitors of all transformers are dispatched by node type, and the children of a node are visited only once,
+    no matter how many of the visitors call generic_visit.
+    """
+
+    def __init__(self, transformers: list[ITransformer]):
+        self.transformers = transformers
+        self.name = "+".join(t.name for t in transformers)
+        self._handlers: dict[type, list[Callable[[AST], AST]]] = {}
+        # key: id of the node. keep the node itself, so the id can't be reused while visiting.
+        self._visited: dict[int, AST] = {}
+
+        # only the visit_XXX methods the transformers define, an inherited NodeVisitor.visit_Constant
+        # would call generic_visit on every constant
+        for transformer in transformers:
+            for typ, attr in NodeTypeIndex.getVisitors(type(transformer)).items():
+                self._handlers.setdefault(typ, []).append(getattr(transformer, attr))
+
+    def getNodeTypes(self) -> Optional[frozenset[type]]:
+        types = frozenset()
+        for transformer in self.transformers:
+            memberTypes = transformer.getNodeTypes()
+            if memberTypes is None:
+                return None
+            types |= memberTypes
+        return types
+
+    def run(self, node: AST) -> AST:
+        for transformer in self.transformers:
+            transformer.fusion = self
+        try:
+            return self.visit(node)
+        finally:
+            for transformer in self.transformers:
+                transformer.fusion = None
+            self._visited.clear()
+
+    def visit(self, node):
+        handlers = self._handlers.get(type(node))
+        if handlers is None:
+            return self.generic_visit(node)
+
+        for handler in handlers:
+            result = handler(node)
+            if result is not node:
+                # replaced, the next cycle will give the others a chance to visit it
+                return result
+
+        return self.generic_visit(node)
+
+    def skipChildren(self, node: AST) -> None:
+        """
+        The children of the node are visited by hand, see ITransformer.visitChild.
+        """
+        self._visited[id(node)] = node
+
+    def generic_visit(self, node):
+        if id(node) in self._visited:
+            return node
+        self._visited[id(node)] = node
+        return super().generic_visit(node)
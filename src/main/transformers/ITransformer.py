@@ -1,33 +1,51 @@
 import ast
 from abc import ABC, abstractmethod
 from ast import NodeTransformer, Module
-from typing import final, Optional
+from typing import final, Optional, TYPE_CHECKING
 
 from colorama import Fore
 
 import Const
+from log.LogLevel import LogLevel
 from log.Logger import Logger
+from utils.NodeTypeIndex import NodeTypeIndex
 from utils.source.CodeSource import CodeSource
 from ast import AST
 from transformers.OptimizeLevel import OptimizeLevel
 
+if TYPE_CHECKING:
+    from transformers.FusedTransformer import FusedTransformer
+
 
 class ITransformer(NodeTransformer, ABC):
     @abstractmethod
-    def __init__(self, name: str, level: OptimizeLevel, post: bool = False):
+    def __init__(self, name: str, level: OptimizeLevel, post: bool = False, fusible: bool = False):
         self.logger = Const.logger
         self.name = name
         self.level = level
         self._changed = False
-        self._flags: set[tuple[str, Optional[tuple[AST, ...]]]] = set()
+        self._dirty = False
         self.post = post
+        # the visitors are stateless and can share a traversal with others, see FusedTransformer
+        self.fusible = fusible
+        self.fusion: Optional[FusedTransformer] = None
 
     def done(self):
         self._changed = True
+        self._dirty = True
 
     def isChanged(self):
         return self._changed
 
+    def markDirty(self):
+        """
+        Mark the module as modified without asking for another transform cycle, so its source will be regenerated.
+        """
+        self._dirty = True
+
+    def isDirty(self):
+        return self._dirty
+
     @final
     def init(self):
         self._init()
@@ -39,12 +57,43 @@ class ITransformer(NodeTransformer, ABC):
     @final
     def onPreTransform(self):
         self._changed = False
+        self._dirty = False
         self._onPreTransform()
 
     @final
     def onPostTransform(self):
         self._onPostTransform()
 
+    def getNodeTypes(self) -> Optional[frozenset[type]]:
+        """
+        The node types this transformer reacts to, it's skipped on modules which contain none of them.
+        Defaults to the types of the visit_XXX methods, or None (always run) if the visit method is overridden.
+        """
+        if type(self).visit is not ITransformer.visit:
+            return None
+        return frozenset(NodeTypeIndex.getVisitors(type(self)).keys())
+
+    def generic_visit(self, node):
+        if self.fusion is not None:
+            return self.fusion.generic_visit(node)
+        return super().generic_visit(node)
+
+    def visitChild(self, node: AST) -> AST:
+        """
+        Visit a single child of the visiting node instead of calling generic_visit, like to skip the code which
+        never runs. The node must be passed to skipChildren then.
+        """
+        if self.fusion is not None:
+            return self.fusion.visit(node)
+        return self.visit(node)
+
+    def skipChildren(self, node: AST) -> None:
+        """
+        Mark the children of a node as visited by visitChild, so the fused transformers don't visit them again.
+        """
+        if self.fusion is not None:
+            self.fusion.skipChildren(node)
+
     @final
     def checkLevel(self) -> bool:
         return Const.transManager.level >= self.level
@@ -58,23 +107,26 @@ class ITransformer(NodeTransformer, ABC):
         :param node: the AST objects visiting.
         :param extraNodes: others nodes for linting.
         """
+        if not self.logger.isEnabled(LogLevel.WARN):
+            return
         if isinstance(message, BaseException):
             message = f"{type(message).__name__}: {str(message)}"
 
-        flagData = message, (node,) + extraNodes
-        if flagData in self._flags:
-            # prevert to spam flag messages
+        manager = Const.transManager
+        source = manager.getCurrentSource()
+        lineno = getattr(node, "lineno", None)
+        flagData = source.getFilepath(), lineno, message
+        if flagData in manager.flagged:
+            # prevent to spam flag messages, also when a module is transformed again
             return
-        self._flags.add(flagData)
+        manager.flagged.add(flagData)
 
-        # Const.transManager.updateSources()
-        source = Const.transManager.getCurrentSource()
         extraMsg = "?"
-        if node is not None:
-            extraMsg = str(node.lineno)
+        if lineno is not None:
+            extraMsg = str(lineno)
             extraMsg += '\n' + Fore.CYAN
 
-            codeLine = source.getSourceLines()[node.lineno - 1]
+            codeLine = source.getSourceLine(lineno) or ""
             flagBlocks = (ast.unparse(n) for n in (node,) + extraNodes)
             for flagBlock in flagBlocks:
                 codeLine = codeLine.replace(
@@ -88,6 +140,28 @@ class ITransformer(NodeTransformer, ABC):
                          f"{Fore.CYAN}{extraMsg}"
                          f"\n{Fore.RED}{message}")
 
+    @final
+    def notice(self, message: str, node: AST = None) -> None:
+        """
+        Log why an optimization is skipped, once per line and message.
+
+        :param message: the reason.
+        :param node: the AST object not optimized.
+        """
+        if not self.logger.isEnabled(LogLevel.INFO):
+            return
+        manager = Const.transManager
+        source = manager.getCurrentSource()
+        lineno = getattr(node, "lineno", None)
+        noticeData = source.getFilepath(), lineno, message
+        if noticeData in manager.flagged:
+            return
+        manager.flagged.add(noticeData)
+
+        self.logger.info(f"{self.name} skipped "
+                         f"{Fore.CYAN}{source.getFilepath()}{Fore.RESET}:"
+                         f"{Fore.CYAN}{'?' if lineno is None else lineno}{Fore.RESET}, {message}")
+
     def _init(self) -> None:
         ...
 
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 import ast
+import importlib
 import time
 from ast import ImportFrom, Import
+from collections import deque
 from ast import Module
-from typing import Type, TextIO, TYPE_CHECKING, Optional, TypeVar
+from concurrent.futures import Executor
+from typing import Type, TYPE_CHECKING, Optional, TypeVar
 
 from colorama import Fore
 from pyfastutil.objects import ObjectArrayList
@@ -12,52 +15,114 @@ from tqdm import tqdm
 
 import Const
 from log.Logger import Logger
+from transformers.FusedTransformer import FusedTransformer
+from transformers.ITransformer import ITransformer
 from transformers.OptimizeLevel import OptimizeLevel
-from transformers.impl.O0.DocumentRemover import DocumentRemover
-from transformers.impl.O1.ConstantFolding import ConstantFolding
-from transformers.impl.O1.DeadCodeElimination import DeadCodeElimination
-from transformers.impl.O2.FunctionComputer import FunctionComputer
-from transformers.impl.O2.LoopUnfolding import LoopUnfolding
-from transformers.impl.O2.VariableRenamer import VariableRenamer
-from transformers.impl.O3.NativeConvertor import NativeConvertor
+from transformers.TransWorker import TransWorker
+from utils.ASTUtils import ASTUtils
+from utils.NodeTypeIndex import NodeTypeIndex
+from utils.Profiler import Profiler
+from utils.Watchdog import Watchdog, WatchdogTimeout
+from utils.cache.MemoryCache import MemoryCache
+from utils.cache.TransCache import TransCache
+from utils.source.BytecodeSource import BytecodeSource
 from utils.source.CodeSource import CodeSource
+from utils.source.OutputWriter import OutputWriter
 from utils.source.Source import Source
+from utils.source.SourceLoader import SourceLoader
 
 if TYPE_CHECKING:
-    from transformers.ITransformer import ITransformer
     T = TypeVar("T", bound=ITransformer)
 
 
 class TransManager:
-    def __init__(self, logger: Logger, level: OptimizeLevel):
+    # transformers in the registering order, key: module path, value: level.
+    # the module is only imported if its level is enabled, the class has the same name as the module.
+    TRANSFORMERS: dict[str, OptimizeLevel] = {
+        "transformers.impl.O1.ConstantFolding": OptimizeLevel.O1,
+        "transformers.impl.O1.DeadCodeElimination": OptimizeLevel.O1,
+        "transformers.impl.O2.ConstantPropagation": OptimizeLevel.O2,
+        "transformers.impl.O2.LoopUnfolding": OptimizeLevel.O2,
+        "transformers.impl.O0.DocumentRemover": OptimizeLevel.O0,
+        # "transformers.impl.O2.UnusedVariableRemover": OptimizeLevel.O2,  # unstable, can't eval class correctly
+        "transformers.impl.O2.VariableRenamer": OptimizeLevel.O2,
+        "transformers.impl.O2.FunctionComputer": OptimizeLevel.O2,
+        "transformers.impl.O3.NativeConvertor": OptimizeLevel.O3,
+        # "transformers.impl.O3.PredictEngineImpl": OptimizeLevel.O3,
+    }
+
+    def __init__(self, logger: Logger, level: OptimizeLevel, jobs: int = 1):
         Const.transManager = self
         self.logger = logger
         self.level = level
+        # count of worker processes, transform in the current process if 1
+        self.jobs = jobs
+        # the pool of worker processes kept between runs, see createExecutor. a pool per run if None
+        self.executor: Optional[Executor] = None
+        self.showProgress = True
         self.sources: list[Source] = ObjectArrayList()
         # Raw sources from file. key: filename, value: Source object.
         self.modules: dict[CodeSource, Module] = {}
         self.transformers: dict[Type[T], T] = {}
+        # general transform cycles needed by each module to converge
+        self.cycles: dict[CodeSource, int] = {}
+        # limits of the general transform of a module
+        self.watchdog = Watchdog(Const.MAX_TRANSFORM_TIME, Const.MAX_TRANSFORM_CYCLES)
+        # modules the watchdog stopped transforming. key: source, value: the reason
+        self.degraded: dict[CodeSource, str] = {}
+        # modules whose source is out of date, only these are unparsed by updateSources.
+        # every parsed module starts dirty, as the output is always regenerated from the AST.
+        self.dirty: set[CodeSource] = set()
+        # sources generated while transforming. key: filepath of the module, value: generated sources.
+        self.extraSources: dict[str, list[Source]] = {}
+        # warnings already flagged by the transformers, see ITransformer.flag. key: (filepath, lineno, message)
+        self.flagged: set[tuple[str, Optional[int], str]] = set()
+
+        self.profiler: Optional[Profiler] = None
+        self.cache: Optional[TransCache | MemoryCache] = None
+        self.cacheKeys: dict[CodeSource, str] = {}
 
         # state while transforming
         self.curSource: Optional[CodeSource] = None
         self.curModule: Optional[Module] = None
 
+    def reset(self) -> None:
+        """
+        Forget the sources of the last run, so the manager and its transformers can be reused by another run.
+        """
+        self.sources = ObjectArrayList()
+        self.modules = {}
+        self.cycles = {}
+        self.degraded = {}
+        self.extraSources = {}
+        self.dirty = set()
+        self.cacheKeys = {}
+        self.curSource = None
+        self.curModule = None
+
     def register(self):
         def doRegister(transformer: ITransformer):
             self.transformers[type(transformer)] = transformer
             transformer.init()
 
-        doRegister(ConstantFolding())
-        doRegister(DeadCodeElimination())
-        doRegister(LoopUnfolding())
-        doRegister(DocumentRemover())
-        # doRegister(UnusedVariableRemover())  # unstable, can't eval class correctly
-        doRegister(VariableRenamer())
-        doRegister(FunctionComputer())
-        doRegister(NativeConvertor())
-        # doRegister(PredictEngineImpl())
+        for path, level in TransManager.TRANSFORMERS.items():
+            if level > self.level:
+                # don't pay for importing the transformers which never run, like the Cython toolchain of O3
+                continue
+            module = importlib.import_module(path)
+            doRegister(getattr(module, path.rsplit(".", 1)[1])())
 
     def parse(self, filename: str):
+        source = SourceLoader.tryRead(filename)
+        if source is not None:
+            self.parseSource(source)
+
+    def parseSource(self, source: CodeSource) -> None:
+        """
+        Add a source to transform, like parse but the code is already read.
+
+        :param source: the source, it's updated in place with the transformed code.
+        """
         def checkModule(mod: Module) -> bool:
             try:
                 for expr in mod.body:
@@ -71,118 +136,362 @@ class TransManager:
             return True
 
         try:
-            file = self._toFile(filename)
-            source = CodeSource(file.name.replace("\\", "/"), file.read())
             self.sources.append(source)
 
-            module = ast.parse(source.getSources())
-            self.logger.debug(f"Find module in source {Fore.CYAN}{source.getFilepath()}{Fore.RESET} "
-                              f"with {len(module.body)} ast objects.")
+            if self.cache is not None:
+                key = self.cache.key(source, self.level,
+                                     (t.name for t in self.transformers.values() if t.checkLevel()))
+                cached = self.cache.load(key)
+                if cached is not None:
+                    code, extraSources = cached
+                    self.logger.debug(lambda: f"Use cached result of {Fore.CYAN}{source.getFilepath()}{Fore.RESET}.")
+                    source.setSources(code)
+                    self.sources.extend(extraSources)
+                    return
+                self.cacheKeys[source] = key
+
+            module = ast.parse(source.getSources()) if self.cache is None else self.cache.parseModule(source)
+            self.dirty.add(source)
+            self.logger.debug(lambda: f"Find module in source {Fore.CYAN}{source.getFilepath()}{Fore.RESET} "
+                                      f"with {len(module.body)} ast objects.")
             if checkModule(module):
                 self.modules[source] = module
             else:
-                self.logger.debug(f"Skipped module in source {source.getFilepath()}.")
+                self.logger.debug(lambda: f"Skipped module in source {source.getFilepath()}.")
 
             for transformer in self.transformers.values():
                 transformer.onParseModule(module, source)
         except SyntaxError as e:
-            self.logger.warn(f"Failed to parse {filename}. skipped.")
+            self.logger.warn(f"Failed to parse {source.getFilepath()}. skipped.")
             self.logger.debug(type(e).__name__, ": ", str(e))
 
-    @staticmethod
-    def _toFile(filename: str) -> TextIO:
-        codecs = ["UTF-8", "UTF-16", "ISO-8859-1", "GBK", "ASCII"]
+    def transform(self) -> list[Source]:
+        startTime = time.perf_counter()
 
-        for codec in codecs:
-            try:
-                file = open(filename, encoding=codec)
-                return file
-            except (UnicodeDecodeError, FileNotFoundError):
-                pass
+        if self.jobs > 1 and len(self.modules) > 1:
+            self.transformParallel()
+        else:
+            self.transformGeneral()
+            self.transformPost()
+
+        for source, cycle in self.cycles.items():
+            self.logger.debug(lambda: f"General-Transform {Fore.CYAN}{source.getFilepath()}{Fore.RESET} "
+                                      f"done in {cycle} cycles.")
+        self.logger.debug(f"General-Transform done in {sum(self.cycles.values())} cycles, "
+                          f"{max(self.cycles.values(), default=0)} at most per module.")
+        if len(self.degraded) > 0:
+            self.logger.warn(f"{len(self.degraded)} modules are not fully optimized, see the warnings above.")
+        self.logger.info(f"Transform done! Cost {time.perf_counter() - startTime:.3f}s")
 
-        raise IOError(f"File {filename} can't be decoded with any supported encoding.")
+        self.updateSources()
+        self.storeCache()
+        return self.sources
 
-    def transform(self) -> list[Source]:
-        cycle = 0
-        isFinish = False
-        startTime = time.perf_counter()
+    def transformStream(self, filenames: list[str], writer: OutputWriter, compileBytecode: bool = False) -> None:
+        """
+        Read, transform and write the modules one by one, only a single module is kept in memory at a time.
 
-        while not isFinish:
-            cycle += 1
-            isFinish = True
+        A module is transformed knowing only itself, onParseModule of the transformers sees a single module at a time.
+        None of the transformers needs the whole program yet, a transformer which does must not be used in this mode.
 
-            with tqdm(
-                    total=len(self.transformers) * 4 * len(self.modules.items()),
-                    leave=False,
-                    desc=f"Transforming cycle: {cycle}"
-            ) as progress:
-                for source, module in self.modules.items():
-                    self.curSource = source
-                    self.curModule = module
+        :param filenames: paths of the python files.
+        :param writer: the started writer to write the results.
+        :param compileBytecode: write bytecode instead of code, see compileSources.
+        """
+        startTime = time.perf_counter()
+        showProgress = self.showProgress
+        self.showProgress = False
+        totalCycles = 0
+        degraded = 0
 
-                    for transformer in self.transformers.values():
-                        if (not transformer.checkLevel()) or transformer.post:
-                            progress.update(4)
-                            continue
+        try:
+            for filename in tqdm(filenames, leave=False, desc="Transforming", disable=not showProgress):
+                self.reset()
+                source = SourceLoader.tryRead(filename)
+                if source is None:
+                    continue
+                self.parseSource(source)
+                self.transformGeneral()
+                self.transformPost()
+                self.updateSources()
+                self.storeCache()
+                if compileBytecode:
+                    self.compileSources()
+
+                degraded += len(self.degraded)
+                for cycle in self.cycles.values():
+                    totalCycles += cycle
+                    self.logger.debug(lambda: f"General-Transform {Fore.CYAN}{source.getFilepath()}{Fore.RESET} "
+                                              f"done in {cycle} cycles.")
+                for output in self.sources:
+                    writer.submit(output)
+        finally:
+            self.reset()
+            self.showProgress = showProgress
+
+        self.logger.debug(f"General-Transform done in {totalCycles} cycles.")
+        if degraded > 0:
+            self.logger.warn(f"{degraded} modules are not fully optimized, see the warnings above.")
+        self.logger.info(f"Transform done! Cost {time.perf_counter() - startTime:.3f}s")
 
-                        progress.update()
-                        transformer.onPreTransform()
+    def storeCache(self) -> None:
+        """
+        Save the transformed modules to the cache, if enabled.
+        """
+        if self.cache is None:
+            return
+        for source in self.modules.keys():
+            key = self.cacheKeys.get(source)
+            if key is not None:
+                self.cache.store(key, source.getSources(), self.extraSources.get(source.getFilepath(), []))
+        evicted = self.cache.evict()
+        self.logger.debug(f"Cache: {self.cache.hits} hits, {self.cache.misses} misses, {evicted} evicted.")
+
+    def transformGeneral(self) -> None:
+        """
+        Run all general transformers on every module until nothing changes.
+        Modules are scheduled by a worklist, only the modules changed in their last cycle are queued again.
+        A module exceeding the limits of the watchdog is left as it is, or restored to the tree of its last finished
+        cycle if it ran out of time in the middle of a cycle.
+        """
+        transformers = self.fuse([i for i in self.transformers.values() if i.checkLevel() and not i.post])
+        worklist: deque[CodeSource] = deque(self.modules.keys())
+        self.watchdog.reset()
+        # the trees of the last finished cycles, only kept if a cycle can be interrupted.
+        # a module without a snapshot hasn't finished a cycle, the original code is its last known good state.
+        snapshots: dict[CodeSource, Module] = {}
+        takeSnapshots = self.watchdog.canInterrupt()
+
+        with tqdm(total=len(worklist), leave=False, desc="Transforming", disable=not self.showProgress) as progress:
+            while len(worklist) > 0:
+                source = worklist.popleft()
+                cycle = self.cycles[source] = self.cycles.get(source, 0) + 1
+
+                try:
+                    with self.watchdog.guard(source):
+                        changed = self.transformCycle(source, transformers)
+                except WatchdogTimeout:
+                    # the tree may be half transformed
+                    self.degrade(source, f"took longer than {self.watchdog.maxTime:g}s")
+                    snapshot = snapshots.pop(source, None)
+                    self.modules[source] = ast.parse(source.getSources()) if snapshot is None else snapshot
+                    self.dirty.add(source)
+                    progress.update()
+                    continue
+
+                # Make sure there's nothing to optimize
+                if changed:
+                    reason = self.watchdog.check(source, self.modules[source], cycle)
+                    if reason is None:
+                        if takeSnapshots:
+                            snapshots[source] = ASTUtils.deepcopy(self.modules[source])
+                        worklist.append(source)
+                        continue
+                    # every finished cycle leaves a valid tree, keep it
+                    self.degrade(source, reason)
+                snapshots.pop(source, None)
+                progress.update()
+
+    def degrade(self, source: CodeSource, reason: str) -> None:
+        """
+        Stop transforming a module, it's reported and never cached.
+        """
+        self.degraded[source] = reason
+        self.cacheKeys.pop(source, None)
+        self.logger.warn(f"Stopped transforming {Fore.CYAN}{source.getFilepath()}{Fore.RESET}: {reason}.")
 
-                        progress.update()
-                        module = transformer.visit(module)
+    def transformCycle(self, source: CodeSource, transformers: list[ITransformer | FusedTransformer]) -> bool:
+        """
+        Run the transformers on a module once.
 
-                        progress.update()
-                        transformer.onPostTransform()
+        :param source: the source of the module.
+        :param transformers: the transformers to run, in order.
+        :return: true if any transformer changed the module.
+        """
+        module = self.modules[source]
+        self.curSource = source
+        self.curModule = module
+
+        index: Optional[NodeTypeIndex] = None
+        changed = False
+        for transformer in transformers:
+            nodeTypes = transformer.getNodeTypes()
+            if nodeTypes is not None:
+                if index is None:
+                    index = NodeTypeIndex(module)
+                if not index.containsAny(nodeTypes):
+                    # nothing to visit
+                    continue
+
+            module, transformerChanged = self.runTransformer(source, module, transformer, "general")
+            if transformerChanged:
+                changed = True
+            members = transformer.transformers if isinstance(transformer, FusedTransformer) else (transformer,)
+            if transformerChanged or any(member.isDirty() for member in members):
+                # the tree is modified, even if only marked dirty, like renamed. it's indexed again when needed,
+                # a transformer can modify nodes in place, so the counts can't be updated from the replaced nodes
+                index = None
+
+        ast.fix_missing_locations(module)
+        self.modules[source] = module
+        return changed
+
+    def runTransformer(self, source: CodeSource, module: Module, transformer: ITransformer | FusedTransformer,
+                       phase: str) -> tuple[Module, bool]:
+        """
+        Run a transformer on a module, with its pre and post transform hooks.
 
-                        progress.update()
-                        ast.fix_missing_locations(module)
+        :param source: the source of the module.
+        :param module: the module.
+        :param transformer: the transformer to run.
+        :param phase: 'general' or 'post', for profiling.
+        :return: the transformed module, and true if the transformer changed it.
+        """
+        profileState = None
+        if self.profiler is not None:
+            self.profiler.instrument(transformer)
+            profileState = self.profiler.begin(transformer)
+
+        if isinstance(transformer, FusedTransformer):
+            members = transformer.transformers
+            for member in members:
+                member.onPreTransform()
+            module = transformer.run(module)
+            for member in members:
+                member.onPostTransform()
+        else:
+            members = (transformer,)
+            transformer.onPreTransform()
+            module = transformer.visit(module)
+            transformer.onPostTransform()
+
+        if self.profiler is not None:
+            self.profiler.end(profileState, transformer, source.getFilepath(), transformer.name,
+                              phase, self.cycles.get(source, 0))
+
+        if any(member.isDirty() for member in members):
+            self.dirty.add(source)
+        return module, any(member.isChanged() for member in members)
 
-                        # Make sure there's nothing to optimize
-                        if transformer.isChanged():
-                            isFinish = False
+    @staticmethod
+    def fuse(transformers: list[ITransformer]) -> list[ITransformer | FusedTransformer]:
+        """
+        Merge every run of adjacent fusible transformers into one traversal, so the order of the passes is kept.
 
-        self.logger.debug(f"General-Transform done in {cycle} cycle.")
+        :param transformers: the transformers to run, in order.
+        :return: the transformers to run, in order.
+        """
+        result: list[ITransformer | FusedTransformer] = ObjectArrayList()
+        run: list[ITransformer] = []
 
+        def flush():
+            if len(run) > 1:
+                result.append(FusedTransformer(list(run)))
+            else:
+                result.extend(run)
+            run.clear()
+
+        for transformer in transformers:
+            if transformer.fusible:
+                run.append(transformer)
+                continue
+            flush()
+            result.append(transformer)
+        flush()
+        return result.to_list()
+
+    def transformPost(self) -> None:
+        """
+        Run all post transformers once on every module.
+        """
         postTransformers: list[ITransformer] = [i for i in self.transformers.values() if i.post and i.checkLevel()]
         with tqdm(
-                total=len(postTransformers) * 4 * len(self.modules.items()),
+                total=len(postTransformers) * len(self.modules.items()),
                 leave=False,
-                desc=f"Transforming post"
+                desc=f"Transforming post",
+                disable=not self.showProgress
         ) as progress:
             for source, module in self.modules.items():
                 self.curSource = source
+                self.curModule = module
 
                 for transformer in postTransformers:
+                    module, _ = self.runTransformer(source, module, transformer, "post")
+                    ast.fix_missing_locations(module)
                     progress.update()
-                    transformer.onPreTransform()
 
-                    progress.update()
-                    module = transformer.visit(module)
+                self.modules[source] = module
 
-                    progress.update()
-                    transformer.onPostTransform()
+    def createExecutor(self, workers: int) -> Executor:
+        """
+        Start a pool of worker processes with the settings of this manager, see TransWorker.
+        The pool transforms at any level, so a long-lived one can be shared by the managers of all levels.
 
-                    progress.update()
-                    ast.fix_missing_locations(module)
+        :param workers: the count of worker processes.
+        """
+        # imports multiprocessing, only needed by parallel runs
+        from concurrent.futures import ProcessPoolExecutor
 
-        self.logger.info(f"Transform done! Cost {time.perf_counter() - startTime:.3f}s")
+        # None if profiling is disabled
+        profileMemory = None if self.profiler is None else self.profiler.traceMemory
+        return ProcessPoolExecutor(max_workers=workers,
+                                   initializer=TransWorker.init,
+                                   initargs=(self.logger.level, Const.pylang.compilerPath, profileMemory,
+                                             self.watchdog.maxTime, self.watchdog.maxCycles))
 
-        self.updateSources()
-        return self.sources
+    def transformParallel(self) -> None:
+        """
+        Farm out every module to a process pool, each worker runs the general and post transform by itself.
+        Results and logs are merged in the parsing order, so the output doesn't depend on the scheduling.
+        The pool is the executor of the manager if set, or a pool started for this run.
+        """
+        items = list(self.modules.items())
+        executor = self.executor
+        if executor is None:
+            workers = min(self.jobs, len(items))
+            executor = self.createExecutor(workers)
+        else:
+            workers = self.jobs
+        self.logger.debug(f"Transforming {len(items)} modules with {workers} workers.")
+
+        try:
+            with tqdm(total=len(items), leave=False, desc="Transforming", disable=not self.showProgress) as progress:
+                futures = [executor.submit(TransWorker.transform, self.level, source, module)
+                           for source, module in items]
+
+                for (source, _), future in zip(items, futures):
+                    module, extraSources, cycle, degraded, profile, records = future.result()
+                    self.logger.replay(records)
+                    if degraded is not None:
+                        self.degraded[source] = degraded
+                        self.cacheKeys.pop(source, None)
+                    if self.profiler is not None:
+                        self.profiler.records.extend(profile)
+                    self.modules[source] = module
+                    self.dirty.add(source)
+                    self.cycles[source] = cycle
+                    for extraSource in extraSources:
+                        self.addSource(extraSource, source)
+                    progress.update()
+        finally:
+            if executor is not self.executor:
+                executor.shutdown()
 
     def updateSources(self) -> None:
         """
-        Update sources attr from modules
+        Update sources attr from modules.
+        Only the dirty modules are unparsed, the others keep the code generated last time.
         """
         if len(self.modules) == 0 and len(self.sources) == 0:
             return
 
-        newSources: list[Source] = ObjectArrayList()
-        for source, module in self.modules.items():
-            code = ast.unparse(module)
-            newSources.append(CodeSource(source.getFilepath(), code))
-            source.setSources(code)
+        for source in self.dirty:
+            module = self.modules.get(source)
+            if module is not None:
+                source.setSources(ast.unparse(module))
+        self.dirty.clear()
 
+        newSources: list[Source] = ObjectArrayList(self.modules.keys())
         existSources = {e.getFilepath() for e in newSources}
         for source in self.sources:
             filename = source.getFilepath()
@@ -191,7 +500,45 @@ class TransManager:
                 existSources.add(filename)
 
         self.sources = newSources
-        self.curSource = next(filter(lambda s: s.getFilepath() == self.getCurrentSource().getFilepath(), self.sources))
+
+    def compileSources(self) -> list[Source]:
+        """
+        Compile the transformed modules to bytecode, call after transform.
+        The module ASTs are compiled directly, only the modules loaded from the cache are compiled from code.
+
+        :return: the sources, with every code source replaced by a bytecode source.
+        """
+        compiled: list[Source] = ObjectArrayList()
+        for source in self.sources:
+            if not isinstance(source, CodeSource):
+                compiled.append(source)
+                continue
+
+            data = source.toBytes()
+            try:
+                code = compile(self.modules.get(source, data), source.getFilepath(), "exec", dont_inherit=True)
+            except (SyntaxError, ValueError, TypeError) as e:
+                # TypeError if the tree is malformed, like a required field missing
+                self.logger.warn(f"Failed to compile {source.getFilepath()}, keep the source.")
+                self.logger.debug(type(e).__name__, ": ", str(e))
+                compiled.append(source)
+                continue
+            compiled.append(BytecodeSource.compile(source.getFilepath(), code, data))
+
+        self.sources = compiled
+        return self.sources
+
+    def addSource(self, source: Source, owner: CodeSource = None) -> None:
+        """
+        Add a source generated while transforming.
+
+        :param source: the generated source, like a compiled native library.
+        :param owner: the module which generates the source, defaults to the current one.
+        """
+        if owner is None:
+            owner = self.getCurrentSource()
+        self.sources.append(source)
+        self.extraSources.setdefault(owner.getFilepath(), []).append(source)
 
     def getCurrentSource(self) -> Optional[CodeSource]:
         return self.curSource
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from ast import Module
+from typing import Optional, Any, TYPE_CHECKING
+
+from pyfastutil.objects import ObjectArrayList
+
+import Const
+from log.LogLevel import LogLevel
+from transformers.OptimizeLevel import OptimizeLevel
+from utils.Profiler import Profiler
+from utils.source.CodeSource import CodeSource
+from utils.source.Source import Source
+
+if TYPE_CHECKING:
+    from transformers.TransManager import TransManager
+
+# the settings passed to init, see TransWorker.getManager
+_settings: Optional[tuple[Optional[bool], float, int]] = None
+# key: the optimize level, a long-lived pool like the one of PylangServer transforms at any level
+_managers: dict[OptimizeLevel, TransManager] = {}
+
+
+class TransWorker:
+    """
+    Entry points running inside the worker processes of TransManager.transformParallel.
+    Every worker owns its Logger, TransManagers and transformers, nothing is shared with other processes.
+    """
+
+    @staticmethod
+    def init(logLevel: LogLevel, compilerPath: Optional[str],
+             profileMemory: Optional[bool], maxTime: float, maxCycles: int) -> None:
+        global _settings
+        from Pylang import Pylang
+        from log.Logger import Logger
+
+        Pylang().compilerPath = compilerPath
+        # shared by the managers of all levels
+        Logger(logLevel, capture=True)
+        _settings = profileMemory, maxTime, maxCycles
+
+    @staticmethod
+    def getManager(level: OptimizeLevel) -> TransManager:
+        """
+        Find the manager of a level, it's registered on the first module of the level.
+        """
+        manager = _managers.get(level)
+        if manager is None:
+            from transformers.TransManager import TransManager
+
+            profileMemory, maxTime, maxCycles = _settings
+            manager = _managers[level] = TransManager(Const.logger, level)
+            manager.showProgress = False
+            manager.watchdog.maxTime = maxTime
+            manager.watchdog.maxCycles = maxCycles
+            if profileMemory is not None:
+                manager.profiler = Profiler(profileMemory)
+            manager.register()
+            # the main process already reported what happened while registering
+            manager.logger.popRecords()
+        # transformers find the manager by Const
+        Const.transManager = manager
+        return manager
+
+    @staticmethod
+    def transform(level: OptimizeLevel, source: CodeSource, module: Module) \
+            -> tuple[Module, list[Source], int, Optional[str], list[dict[str, Any]], list[tuple[LogLevel, str]]]:
+        """
+        Transform a single module with the worker's own manager.
+
+        :param level: the optimize level.
+        :param source: the source of the module.
+        :param module: the parsed module.
+        :return: the transformed module, sources generated while transforming, general transform cycles,
+                 the reason if the watchdog stopped transforming it, profile records, and the captured logs.
+        """
+        manager = TransWorker.getManager(level)
+        manager.sources = ObjectArrayList([source])
+        manager.modules = {source: module}
+        manager.dirty = {source}
+        manager.cycles.clear()
+        manager.degraded.clear()
+        manager.extraSources.clear()
+        # the warnings of every module are reported, the worker may outlive a request of PylangServer
+        manager.flagged.clear()
+
+        for transformer in manager.transformers.values():
+            transformer.onParseModule(module, source)
+
+        manager.transformGeneral()
+        manager.transformPost()
+
+        profile: list[dict[str, Any]] = []
+        if manager.profiler is not None:
+            profile = manager.profiler.records.to_list()
+            manager.profiler.records.clear()
+
+        extraSources = manager.extraSources.get(source.getFilepath(), [])
+        return (manager.modules[source], extraSources, manager.cycles[source], manager.degraded.get(source),
+                profile, manager.logger.popRecords())
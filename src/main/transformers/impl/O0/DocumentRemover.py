@@ -8,7 +8,7 @@ from transformers.OptimizeLevel import OptimizeLevel
 
 class DocumentRemover(ITransformer):
     def __init__(self):
-        super().__init__("DocumentRemover", OptimizeLevel.O0)
+        super().__init__("DocumentRemover", OptimizeLevel.O0, fusible=True)
 
     # work wrongly with @dataclass
     # def visit_AnnAssign(self, node):
@@ -1,16 +1,37 @@
 import ast
-import typing
-from ast import Constant
-from typing import Optional, Any
+from ast import Constant, JoinedStr, FormattedValue
+from typing import Any
 
 from transformers.ITransformer import ITransformer
 from transformers.OptimizeLevel import OptimizeLevel
-from utils.ASTUtils import ASTUtils
+from utils.ASTUtils import ASTUtils, FOLDED_VALUE
+from utils.eval.EvalBudget import EvalBudget, BudgetExceeded
 
 
 class ConstantFolding(ITransformer):
     def __init__(self):
-        super().__init__("ConstantFolding", OptimizeLevel.O1)
+        super().__init__("ConstantFolding", OptimizeLevel.O1, fusible=True)
+        # ids of the format specs of the f-strings visiting, they must stay JoinedStr
+        self.__formatSpecs: set[int] = set()
+
+    def _onPreTransform(self) -> None:
+        self.__formatSpecs.clear()
+
+    def replace(self, node: ast.expr, result: object) -> ast.expr:
+        """
+        Replace an expression by its value, if the value can be written as a small enough literal.
+        Otherwise, the value is kept in the expression, so the expressions using it can still be folded.
+        """
+        try:
+            EvalBudget.checkResult(result)
+        except BudgetExceeded:
+            setattr(node, FOLDED_VALUE, result)
+            return node
+        expr = ASTUtils.toExpr(result)
+        if expr is None:
+            return node
+        self.done()
+        return ast.copy_location(expr, node)
 
     def visit_If(self, node):
         if isinstance(node.test, Constant) and not isinstance(node.test.value, bool):
@@ -24,86 +45,271 @@ class ConstantFolding(ITransformer):
             node.test = Constant(bool(node.test.value))
         return self.generic_visit(node)
 
+    @staticmethod
+    def compare(op: ast.cmpop, left: Any, right: Any) -> Any:
+        match type(op):
+            case ast.Eq:
+                return left == right
+            case ast.NotEq:
+                return left != right
+            case ast.Lt:
+                return left < right
+            case ast.LtE:
+                return left <= right
+            case ast.Gt:
+                return left > right
+            case ast.GtE:
+                return left >= right
+            case ast.Is:
+                return left is right
+            case ast.IsNot:
+                return left is not right
+            case ast.In:
+                return left in right
+            case ast.NotIn:
+                return left not in right
+
     def visit_Compare(self, node):
-        if (isinstance(node.left, Constant)
-                and len(node.ops) == 1
-                and len(node.comparators) == 1 and isinstance(node.comparators[0], Constant)):
-            left = node.left.value
-            right = typing.cast(Constant, node.comparators[0]).value
+        self.generic_visit(node)
+        if FOLDED_VALUE in node.__dict__:
+            # evaluated in an earlier cycle
+            return node
 
-            result: Optional[bool] = None
-            try:
-                match type(node.ops[0]):
-                    case ast.Eq:
-                        result = left == right
-                    case ast.NotEq:
-                        result = left != right
-                    case ast.Lt:
-                        result = left < right
-                    case ast.LtE:
-                        result = left <= right
-                    case ast.Gt:
-                        result = left > right
-                    case ast.GtE:
-                        result = left >= right
-                    case ast.Is:
-                        result = left is right
-                    case ast.IsNot:
-                        result = left is not right
-                    case ast.In:
-                        result = left in right
-                    case ast.NotIn:
-                        result = left not in right
-            except Exception as e:
-                self.flag(e, node)
-                return ASTUtils.raiseExpr(e)
-
-            if result is not None:
-                self.done()
-                return Constant(value=result)
+        try:
+            operands = [ASTUtils.toValue(node.left)] + [ASTUtils.toValue(c) for c in node.comparators]
+        except ValueError:
+            return node
 
-        return self.generic_visit(node)
+        result: Any = True
+        try:
+            # 'a < b < c' is 'a < b and b < c', stop at the first false result
+            for i, op in enumerate(node.ops):
+                result = ConstantFolding.compare(op, operands[i], operands[i + 1])
+                if not result:
+                    break
+        except Exception as e:
+            self.flag(e, node)
+            return ASTUtils.raiseExpr(e)
+
+        return self.replace(node, result)
 
     def visit_BinOp(self, node):
-        if isinstance(node.left, Constant) and isinstance(node.right, Constant):
-            left = node.left.value
-            right = node.right.value
+        self.generic_visit(node)
+        if FOLDED_VALUE in node.__dict__:
+            # evaluated in an earlier cycle
+            return node
+
+        try:
+            left = ASTUtils.toValue(node.left)
+            right = ASTUtils.toValue(node.right)
+        except ValueError:
+            return node
+
+        result: Any = None
+        try:
+            EvalBudget.checkBinOp(node.op, left, right)
+            match type(node.op):
+                case ast.Add:
+                    result = left + right
+                case ast.BitAnd:
+                    result = left & right
+                case ast.BitOr:
+                    result = left | right
+                case ast.BitXor:
+                    result = left ^ right
+                case ast.Div:
+                    result = left / right
+                case ast.FloorDiv:
+                    result = left // right
+                case ast.LShift:
+                    result = left << right
+                case ast.MatMult:
+                    result = left @ right
+                case ast.Mod:
+                    result = left % right
+                case ast.Mult:
+                    result = left * right
+                case ast.Pow:
+                    result = left ** right
+                case ast.RShift:
+                    result = left >> right
+                case ast.Sub:
+                    result = left - right
+        except BudgetExceeded as e:
+            self.notice(str(e), node)
+            return node
+        except Exception as e:
+            self.flag(e, node)
+            return ASTUtils.raiseExpr(e)
+
+        return self.replace(node, result)
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if FOLDED_VALUE in node.__dict__:
+            # evaluated in an earlier cycle
+            return node
+
+        if (isinstance(node.op, ast.USub) and isinstance(node.operand, Constant)
+                and type(node.operand.value) in (int, float, complex)):
+            # already a negative number literal
+            return node
+        try:
+            operand = ASTUtils.toValue(node.operand)
+        except ValueError:
+            return node
+
+        result: Any = None
+        try:
+            match type(node.op):
+                case ast.Not:
+                    result = not operand
+                case ast.USub:
+                    result = -operand
+                case ast.UAdd:
+                    result = +operand
+                case ast.Invert:
+                    result = ~operand
+        except Exception as e:
+            self.flag(e, node)
+            return ASTUtils.raiseExpr(e)
+
+        return self.replace(node, result)
+
+    def visit_BoolOp(self, node):
+        # visit the operands left to right, the ones after a literal which decides the result never run,
+        # so they are neither visited nor flagged
+        isAnd = isinstance(node.op, ast.And)
+        values = []
+        for operand in node.values:
+            operand = self.visitChild(operand)
+            values.append(operand)
+            try:
+                if bool(ASTUtils.toValue(operand)) != isAnd:
+                    break
+            except ValueError:
+                continue
+        self.skipChildren(node)
+        if len(values) < len(node.values):
+            self.done()
+        node.values = values
 
-            result: Optional[Any] = None
+        # drop the leading literals which don't decide the result, stop at the first one which does
+        index = 0
+        while index < len(node.values):
             try:
-                match type(node.op):
-                    case ast.Add:
-                        result = left + right
-                    case ast.BitAnd:
-                        result = left & right
-                    case ast.BitOr:
-                        result = left | right
-                    case ast.BitXor:
-                        result = left ^ right
-                    case ast.Div:
-                        result = left / right
-                    case ast.FloorDiv:
-                        result = left // right
-                    case ast.LShift:
-                        result = left << right
-                    case ast.MatMult:
-                        result = left @ right
-                    case ast.Mod:
-                        result = left % right
-                    case ast.Mult:
-                        result = left * right
-                    case ast.Pow:
-                        result = left ** right
-                    case ast.RShift:
-                        result = left >> right
-                    case ast.Sub:
-                        result = left - right
-            except Exception as e:
-                self.flag(e, node)
-                return ASTUtils.raiseExpr(e)
-
-            if result is not None:
+                value = ASTUtils.toValue(node.values[index])
+            except ValueError:
+                break
+            if bool(value) != isAnd:
+                # short circuit, the operands after it are never evaluated
                 self.done()
-                return Constant(value=result)
+                return node.values[index]
+            index += 1
+
+        if index == 0:
+            return node
+        self.done()
+        if index >= len(node.values) - 1:
+            # the value of a bool operation is its last evaluated operand
+            return node.values[-1]
+        node.values = node.values[index:]
+        return node
+
+    def visit_Subscript(self, node):
+        self.generic_visit(node)
+        if FOLDED_VALUE in node.__dict__:
+            # evaluated in an earlier cycle
+            return node
 
+        if not isinstance(node.ctx, ast.Load):
+            return node
+        try:
+            if isinstance(node.slice, ast.Slice):
+                index = slice(*(None if part is None else ASTUtils.toValue(part)
+                                for part in (node.slice.lower, node.slice.upper, node.slice.step)))
+            else:
+                index = ASTUtils.toValue(node.slice)
+            value = ASTUtils.toValue(node.value)
+        except ValueError:
+            return node
+
+        try:
+            result = value[index]
+        except Exception as e:
+            self.flag(e, node)
+            return ASTUtils.raiseExpr(e)
+
+        return self.replace(node, result)
+
+    def visit_FormattedValue(self, node):
+        if node.format_spec is not None:
+            self.__formatSpecs.add(id(node.format_spec))
         return self.generic_visit(node)
+
+    def visit_JoinedStr(self, node):
+        self.generic_visit(node)
+
+        values: list[ast.expr] = []
+        changed = False
+        for part in node.values:
+            if isinstance(part, FormattedValue):
+                try:
+                    text = self.format(part)
+                except BudgetExceeded as e:
+                    self.notice(str(e), node)
+                    text = None
+                except ValueError:
+                    text = None
+                except Exception as e:
+                    self.flag(e, node)
+                    return ASTUtils.raiseExpr(e)
+                if text is not None:
+                    part = Constant(value=text)
+                    changed = True
+            if isinstance(part, Constant) and len(values) > 0 and isinstance(values[-1], Constant):
+                values[-1] = Constant(value=values[-1].value + part.value)
+                changed = True
+            else:
+                values.append(part)
+
+        if id(node) in self.__formatSpecs:
+            # a format spec is always a JoinedStr
+            if changed:
+                self.done()
+                node.values = values
+            return node
+        if all(isinstance(part, Constant) for part in values):
+            return self.replace(node, "".join(part.value for part in values))
+        if changed:
+            self.done()
+            node.values = values
+        return node
+
+    @staticmethod
+    def format(node: FormattedValue) -> str:
+        """
+        Format a replacement field of an f-string.
+
+        :raise ValueError: if the value or the format spec isn't a literal.
+        :raise BudgetExceeded: if the result would be too large.
+        """
+        value = ASTUtils.toValue(node.value)
+        spec = ""
+        if node.format_spec is not None:
+            parts = node.format_spec.values
+            if not all(isinstance(part, Constant) for part in parts):
+                raise ValueError("format spec isn't a literal")
+            spec = "".join(part.value for part in parts)
+
+        match node.conversion:
+            case 115:  # !s
+                value = str(value)
+            case 114:  # !r
+                value = repr(value)
+            case 97:  # !a
+                value = ascii(value)
+        EvalBudget.checkFormat(value, spec)
+        result = format(value, spec)
+        EvalBudget.checkResult(result)
+        return result
@@ -6,7 +6,16 @@ from transformers.OptimizeLevel import OptimizeLevel
 
 class DeadCodeElimination(ITransformer):
     def __init__(self):
-        super().__init__("DeadCodeElimination", OptimizeLevel.O1)
+        super().__init__("DeadCodeElimination", OptimizeLevel.O1, fusible=True)
+
+    def fillBody(self, node):
+        """
+        Put a 'pass' into the body of a statement if all statements in it are eliminated.
+        """
+        if len(node.body) == 0:
+            self.done()
+            node.body.append(ast.Pass())
+        return node
 
     def visit_If(self, node):
         self.generic_visit(node)
@@ -20,7 +29,7 @@ class DeadCodeElimination(ITransformer):
                     return node.orelse
                 else:
                     return []
-        return node
+        return self.fillBody(node)
 
     def visit_While(self, node):
         self.generic_visit(node)
@@ -29,7 +38,39 @@ class DeadCodeElimination(ITransformer):
             if not node.test.value:
                 self.done()
                 return []
-        return node
+        return self.fillBody(node)
+
+    def visit_For(self, node):
+        self.generic_visit(node)
+        return self.fillBody(node)
+
+    def visit_AsyncFor(self, node):
+        self.generic_visit(node)
+        return self.fillBody(node)
+
+    def visit_With(self, node):
+        self.generic_visit(node)
+        return self.fillBody(node)
+
+    def visit_AsyncWith(self, node):
+        self.generic_visit(node)
+        return self.fillBody(node)
+
+    def visit_Try(self, node):
+        self.generic_visit(node)
+        return self.fillBody(node)
+
+    def visit_TryStar(self, node):
+        self.generic_visit(node)
+        return self.fillBody(node)
+
+    def visit_ExceptHandler(self, node):
+        self.generic_visit(node)
+        return self.fillBody(node)
+
+    def visit_match_case(self, node):
+        self.generic_visit(node)
+        return self.fillBody(node)
 
     def visit_IfExp(self, node):
         self.generic_visit(node)
@@ -0,0 +1,505 @@
+from __future__ import annotations
+
+import ast
+from ast import (AST, Name, Load, Store, Del, Constant, Tuple, UnaryOp, USub, FunctionDef, AsyncFunctionDef,
+                 ClassDef, Lambda, Global, Nonlocal, Import, ImportFrom, stmt, expr)
+from types import NoneType, EllipsisType
+from typing import Optional, Iterator, Iterable
+
+import Const
+from transformers.ITransformer import ITransformer
+from transformers.OptimizeLevel import OptimizeLevel
+from utils.ASTUtils import ASTUtils
+from utils.eval.EvalBudget import EvalBudget
+
+# a dict of names to values, or None after a statement which never completes, like return
+Values = Optional[dict[str, expr]]
+
+
+class ConstantPropagation(ITransformer):
+    """
+    Replace the loads of variables by the literals or the variables they were assigned, like 'y = x * N' by
+    'y = x * 64' after 'N = 64', so ConstantFolding, DeadCodeElimination and LoopUnfolding can go on.
+
+    The assignments reaching a load are tracked along the statements of every function and of the module:
+    the branches of an if are merged, and the variables assigned in a loop, a try, a with or a match are
+    forgotten before it, as they may be assigned or not on the way to any statement in it.
+    A variable is never tracked if it's declared global or nonlocal by any scope, and nothing is propagated
+    in modules using star imports, exec, eval, globals, locals or vars.
+    The operands of 'is' and 'is not', and the variables assigned to others, only get copies of variables and
+    singletons like None, as a literal copied to each of them may not be the same object.
+
+    A nested function, class or lambda may run at any time, so it only gets the variables of the enclosing scopes
+    bound a single time, by a literal assignment executed before the nested scope is defined.
+    """
+    # names of the functions which read or write the variables of a scope by their names
+    INTROSPECTION = frozenset({"exec", "eval", "globals", "locals", "vars"})
+
+    def __init__(self):
+        super().__init__("ConstantPropagation", OptimizeLevel.O2)
+        # the values of the variables of the scope visiting, at the statement visiting
+        self.values: Values = {}
+        # the variables of the scope visiting which can be tracked
+        self.tracked: set[str] = set()
+        # the literals of the variables of the enclosing scopes, read by the scope visiting
+        self.inherited: dict[str, expr] = {}
+        # the variables of the scope visiting bound only once, by a literal assignment. value: (statement index, value)
+        self.fixed: dict[str, tuple[int, expr]] = {}
+        # the index of the statement visiting in the body of the scope
+        self.index = 0
+        # the literals for the scopes nested in the class visiting, a class body isn't an enclosing scope
+        self.classInherited: Optional[dict[str, expr]] = None
+
+    def visit_Module(self, node):
+        for child in ast.walk(node):
+            if isinstance(child, ImportFrom) and any(alias.name == "*" for alias in child.names):
+                return node
+            if isinstance(child, Name) and child.id in ConstantPropagation.INTROSPECTION:
+                return node
+
+        # may be assigned by any function
+        declaredGlobal = {name for child in ast.walk(node) if isinstance(child, Global) for name in child.names}
+        self.visitScope(node.body, (), declaredGlobal, {})
+        return node
+
+    # ---------------------------------------------------------------- scopes
+
+    @staticmethod
+    def walkScope(nodes: Iterable[AST]) -> Iterator[AST]:
+        """
+        Walk the nodes evaluated in a scope, without the bodies of the nested functions, classes and lambdas.
+        The comprehensions are walked, the names they bind are counted in the scope, which only loses propagations.
+        """
+        stack = list(nodes)
+        stack.reverse()
+        while len(stack) > 0:
+            node = stack.pop()
+            yield node
+            match node:
+                case FunctionDef() | AsyncFunctionDef() | Lambda():
+                    args = node.args
+                    children = [*getattr(node, "decorator_list", ()), *args.defaults,
+                                *(default for default in args.kw_defaults if default is not None)]
+                case ClassDef():
+                    children = [*node.decorator_list, *node.bases, *node.keywords]
+                case _:
+                    children = list(ast.iter_child_nodes(node))
+            children.reverse()
+            stack.extend(children)
+
+    @staticmethod
+    def bindings(nodes: Iterable[AST]) -> tuple[dict[str, int], set[str]]:
+        """
+        :return: the count of bindings of every name in a scope, and the names declared global or nonlocal.
+        """
+        bound: dict[str, int] = {}
+        declared: set[str] = set()
+
+        def bind(name: str) -> None:
+            bound[name] = bound.get(name, 0) + 1
+
+        for node in ConstantPropagation.walkScope(nodes):
+            match node:
+                case Name(ctx=Store() | Del()):
+                    bind(node.id)
+                case FunctionDef() | AsyncFunctionDef() | ClassDef():
+                    bind(node.name)
+                case Import() | ImportFrom():
+                    for alias in node.names:
+                        bind(alias.asname or alias.name.split(".")[0])
+                case ast.ExceptHandler(name=str()) | ast.MatchAs(name=str()) | ast.MatchStar(name=str()):
+                    bind(node.name)
+                case ast.MatchMapping(rest=str()):
+                    bind(node.rest)
+                case Global() | Nonlocal():
+                    declared.update(node.names)
+        return bound, declared
+
+    @staticmethod
+    def isLiteral(node: AST) -> bool:
+        """
+        Immutable literals small enough to be copied to every load.
+        """
+        if isinstance(node, Tuple):
+            if not isinstance(node.ctx, Load) or not all(ConstantPropagation.isLiteral(elt) for elt in node.elts):
+                return False
+        elif isinstance(node, UnaryOp):
+            # a negative number in the form of ASTUtils.toExpr
+            if not (isinstance(node.op, USub) and isinstance(node.operand, Constant)
+                    and type(node.operand.value) in (int, float)):
+                return False
+        elif not isinstance(node, Constant):
+            return False
+        return EvalBudget.sizeOf(ASTUtils.toValue(node), Const.PROPAGATION_MAX_SIZE) <= Const.PROPAGATION_MAX_SIZE
+
+    def visitScope(self, body: list[stmt], params: Iterable[str], excluded: set[str],
+                   inherited: dict[str, expr]) -> None:
+        """
+        Propagate in the body of the module or a function.
+
+        :param body: the statements.
+        :param params: the names of the parameters of a function.
+        :param excluded: the variables which can't be tracked, like the ones declared nonlocal in a nested scope.
+        :param inherited: the literals of the enclosing scopes.
+        """
+        outer = self.values, self.tracked, self.inherited, self.fixed, self.index, self.classInherited
+
+        bound, declared = ConstantPropagation.bindings(body)
+        for param in params:
+            bound[param] = bound.get(param, 0) + 1
+        self.tracked = {name for name in bound if name not in declared and name not in excluded}
+        self.inherited = {name: value for name, value in inherited.items()
+                          if name not in bound and name not in declared}
+        self.fixed = {}
+        for i, statement in enumerate(body):
+            match statement:
+                case ast.Assign(targets=[Name(id=name)], value=value) | ast.AnnAssign(
+                    target=Name(id=name), value=value, simple=1) if value is not None:
+                    if bound.get(name) == 1 and name in self.tracked and ConstantPropagation.isLiteral(value):
+                        self.fixed[name] = i, value
+        self.values = {}
+        self.classInherited = None
+
+        for i, statement in enumerate(body):
+            self.index = i
+            self.visitStmt(statement)
+
+        self.values, self.tracked, self.inherited, self.fixed, self.index, self.classInherited = outer
+
+    def nestedInherited(self) -> dict[str, expr]:
+        """
+        The literals for a scope defined by the statement visiting.
+        """
+        if self.classInherited is not None:
+            return self.classInherited
+        inherited = dict(self.inherited)
+        for name, (index, value) in self.fixed.items():
+            if index < self.index:
+                inherited[name] = value
+        return inherited
+
+    def visitFunction(self, node: FunctionDef | AsyncFunctionDef | Lambda) -> None:
+        args = node.args
+        params = [arg.arg for arg in (*args.posonlyargs, *args.args, *args.kwonlyargs, args.vararg, args.kwarg)
+                  if arg is not None]
+        # may be assigned by the functions nested in it
+        excluded = {name for child in ast.walk(node) if isinstance(child, Nonlocal) for name in child.names}
+        if isinstance(node, Lambda):
+            body = [ast.Expr(value=node.body)]
+            self.visitScope(body, params, excluded, self.nestedInherited())
+            node.body = body[0].value
+        else:
+            self.visitScope(node.body, params, excluded, self.nestedInherited())
+
+    def visitClass(self, node: ClassDef) -> None:
+        """
+        Propagate the literals of the enclosing scopes to a class body, the class variables aren't tracked.
+        """
+        outer = self.values, self.tracked, self.inherited, self.fixed, self.index, self.classInherited
+
+        inherited = self.nestedInherited()
+        bound, declared = ConstantPropagation.bindings(node.body)
+        self.values = {}
+        self.tracked = set()
+        self.inherited = {name: value for name, value in inherited.items()
+                          if name not in bound and name not in declared}
+        self.fixed = {}
+        self.classInherited = inherited
+        self.visitBlock(node.body)
+
+        self.values, self.tracked, self.inherited, self.fixed, self.index, self.classInherited = outer
+
+    # ---------------------------------------------------------------- values
+
+    def kill(self, names: Iterable[str]) -> None:
+        if self.values is None:
+            return
+        for name in names:
+            self.values.pop(name, None)
+            # the copies of it
+            for other in [other for other, value in self.values.items()
+                          if isinstance(value, Name) and value.id == name]:
+                del self.values[other]
+
+    def bind(self, name: str, value: Optional[expr]) -> None:
+        self.kill((name,))
+        if self.values is None or name not in self.tracked or value is None:
+            return
+        if ConstantPropagation.isLiteral(value):
+            self.values[name] = value
+        elif isinstance(value, Name) and isinstance(value.ctx, Load) and value.id in self.tracked \
+                and value.id != name:
+            self.values[name] = Name(id=value.id, ctx=Load())
+
+    def killBound(self, nodes: Iterable[AST]) -> None:
+        self.kill(ConstantPropagation.bindings(nodes)[0].keys())
+
+    @staticmethod
+    def merge(first: Values, second: Values) -> Values:
+        if first is None:
+            return second
+        if second is None:
+            return first
+        return {name: value for name, value in first.items()
+                if name in second and ast.dump(second[name]) == ast.dump(value)}
+
+    def copyValues(self) -> Values:
+        return None if self.values is None else dict(self.values)
+
+    # ---------------------------------------------------------------- statements
+
+    def visitBlock(self, body: list[stmt]) -> None:
+        for statement in body:
+            if self.values is None:
+                # unreachable
+                self.values = {}
+                self.visitStmt(statement)
+                self.values = None
+            else:
+                self.visitStmt(statement)
+
+    def visitExpr(self, node: Optional[expr]) -> Optional[expr]:
+        return None if node is None else self.visit(node)
+
+    def visitValue(self, node: Optional[expr]) -> Optional[expr]:
+        """
+        Visit an assigned value, 'b = a' keeps 'b' the same object as 'a'.
+        """
+        if isinstance(node, Name):
+            return self.replace(node, True)
+        return self.visitExpr(node)
+
+    def visitTarget(self, node: expr) -> None:
+        """
+        Visit the loads in an assignment target, like the 'a' and 'i' of 'a[i] = 0'.
+        """
+        match node:
+            case ast.Attribute():
+                node.value = self.visitExpr(node.value)
+            case ast.Subscript():
+                node.value = self.visitExpr(node.value)
+                node.slice = self.visitExpr(node.slice)
+            case Tuple() | ast.List():
+                for elt in node.elts:
+                    self.visitTarget(elt)
+            case ast.Starred():
+                self.visitTarget(node.value)
+
+    def visitStmt(self, node: stmt) -> None:
+        match node:
+            case ast.Expr():
+                node.value = self.visitExpr(node.value)
+            case ast.Assign():
+                node.value = self.visitValue(node.value)
+                for target in node.targets:
+                    self.visitTarget(target)
+                if len(node.targets) == 1 and isinstance(node.targets[0], Name):
+                    self.bind(node.targets[0].id, node.value)
+                else:
+                    self.killBound(node.targets)
+            case ast.AnnAssign():
+                # the annotation is left as it's written
+                node.value = self.visitValue(node.value)
+                self.visitTarget(node.target)
+                if isinstance(node.target, Name):
+                    self.bind(node.target.id, node.value)
+            case ast.AugAssign():
+                node.value = self.visitExpr(node.value)
+                self.visitTarget(node.target)
+                self.killBound((node.target,))
+            case ast.Delete():
+                for target in node.targets:
+                    self.visitTarget(target)
+                self.killBound(node.targets)
+            case ast.Return():
+                node.value = self.visitExpr(node.value)
+                self.values = None
+            case ast.Raise():
+                node.exc = self.visitExpr(node.exc)
+                node.cause = self.visitExpr(node.cause)
+                self.values = None
+            case ast.Break() | ast.Continue():
+                self.values = None
+            case ast.Assert():
+                node.test = self.visitExpr(node.test)
+                node.msg = self.visitExpr(node.msg)
+            case Import() | ImportFrom():
+                self.killBound((node,))
+            case ast.If():
+                node.test = self.visitExpr(node.test)
+                values = self.copyValues()
+                self.visitBlock(node.body)
+                bodyValues = self.values
+                self.values = values
+                self.visitBlock(node.orelse)
+                self.values = ConstantPropagation.merge(bodyValues, self.values)
+            case ast.While():
+                # the test is evaluated again after every iteration
+                self.killBound((node,))
+                self.visitLoop(node)
+            case ast.For() | ast.AsyncFor():
+                # the iterable is evaluated once before the loop
+                node.iter = self.visitExpr(node.iter)
+                self.killBound((node,))
+                self.visitLoop(node)
+            case ast.With() | ast.AsyncWith():
+                for item in node.items:
+                    item.context_expr = self.visitExpr(item.context_expr)
+                    if item.optional_vars is not None:
+                        self.visitTarget(item.optional_vars)
+                        self.killBound((item.optional_vars,))
+                # the exit may swallow an exception raised anywhere in the body
+                self.killBound(node.body)
+                values = self.copyValues()
+                self.visitBlock(node.body)
+                self.values = values
+            case ast.Try() | ast.TryStar():
+                # an exception may be raised anywhere in the body
+                self.killBound((node,))
+                values = self.copyValues()
+                self.visitBlock(node.body)
+                self.visitBlock(node.orelse)
+                for handler in node.handlers:
+                    self.values = dict(values) if values is not None else None
+                    handler.type = self.visitExpr(handler.type)
+                    self.visitBlock(handler.body)
+                # the final body always runs
+                self.values = values
+                self.visitBlock(node.finalbody)
+            case ast.Match():
+                node.subject = self.visitExpr(node.subject)
+                # the patterns are left as they are, a name in a value pattern can't be replaced by a literal
+                self.killBound((node,))
+                values = self.copyValues()
+                for case in node.cases:
+                    self.values = dict(values) if values is not None else None
+                    case.guard = self.visitExpr(case.guard)
+                    self.visitBlock(case.body)
+                self.values = values
+            case FunctionDef() | AsyncFunctionDef():
+                node.decorator_list = [self.visitExpr(decorator) for decorator in node.decorator_list]
+                self.visitDefaults(node.args)
+                self.visitFunction(node)
+                self.bind(node.name, None)
+            case ClassDef():
+                node.decorator_list = [self.visitExpr(decorator) for decorator in node.decorator_list]
+                node.bases = [self.visitExpr(base) for base in node.bases]
+                for keyword in node.keywords:
+                    keyword.value = self.visitExpr(keyword.value)
+                self.visitClass(node)
+                self.bind(node.name, None)
+            case _:
+                # Global, Nonlocal, Pass and the statements of newer Python versions
+                self.killBound((node,))
+
+    def visitLoop(self, node: ast.While | ast.For | ast.AsyncFor) -> None:
+        values = self.copyValues()
+        if isinstance(node, ast.While):
+            node.test = self.visitExpr(node.test)
+        else:
+            self.visitTarget(node.target)
+        self.visitBlock(node.body)
+        self.values = dict(values) if values is not None else None
+        self.visitBlock(node.orelse)
+        self.values = values
+
+    def visitDefaults(self, args: ast.arguments) -> None:
+        args.defaults = [self.visitExpr(default) for default in args.defaults]
+        args.kw_defaults = [self.visitExpr(default) for default in args.kw_defaults]
+
+    # ---------------------------------------------------------------- expressions
+
+    def visit_Name(self, node):
+        return self.replace(node, False)
+
+    def replace(self, node: Name, identity: bool) -> expr:
+        """
+        :param identity: if the identity of the value is compared, only the names and the singletons are copied.
+        """
+        if not isinstance(node.ctx, Load):
+            return node
+        value = self.values.get(node.id) if self.values is not None else None
+        if value is None:
+            value = self.inherited.get(node.id)
+        if value is None:
+            return node
+        if identity and not (isinstance(value, Name) or isinstance(value, Constant)
+                             and type(value.value) in (NoneType, bool, EllipsisType)):
+            # every copy of a literal may be a new object, 'a is b' would become '(1, 2) is (1, 2)'
+            return node
+        self.done()
+        return ast.copy_location(ASTUtils.deepcopy(value), node)
+
+    def visit_Compare(self, node):
+        identity = any(isinstance(op, (ast.Is, ast.IsNot)) for op in node.ops)
+        node.left = self.replace(node.left, identity) if isinstance(node.left, Name) else self.visitExpr(node.left)
+        node.comparators = [self.replace(operand, identity) if isinstance(operand, Name) else self.visitExpr(operand)
+                            for operand in node.comparators]
+        return node
+
+    def visit_NamedExpr(self, node):
+        node.value = self.visitExpr(node.value)
+        self.bind(node.target.id, None)
+        return node
+
+    def visit_Lambda(self, node):
+        self.visitDefaults(node.args)
+        self.visitFunction(node)
+        return node
+
+    def visit_Dict(self, node):
+        # the keys and the values are evaluated in turn
+        for i in range(len(node.keys)):
+            node.keys[i] = self.visitExpr(node.keys[i])
+            node.values[i] = self.visitExpr(node.values[i])
+        return node
+
+    def visitComprehension(self, node: ast.ListComp | ast.SetComp | ast.DictComp | ast.GeneratorExp,
+                           lazy: bool = False) -> None:
+        """
+        Propagate in a comprehension, without the variables it binds.
+
+        :param lazy: if the comprehension is a generator, only its first iterable is evaluated at once.
+        """
+        # the walrus operators assign the enclosing scope
+        self.kill({child.target.id for child in ast.walk(node) if isinstance(child, ast.NamedExpr)})
+        first = node.generators[0]
+        first.iter = self.visitExpr(first.iter)
+
+        outer = self.values, self.inherited
+        targets = ConstantPropagation.bindings(generator.target for generator in node.generators)[0]
+        values = {} if lazy or self.values is None else self.values
+        inherited = self.nestedInherited() if lazy else self.inherited
+        # neither the loop variables nor the copies of the variables they hide
+        self.values = {name: value for name, value in values.items()
+                       if name not in targets and not (isinstance(value, Name) and value.id in targets)}
+        self.inherited = {name: value for name, value in inherited.items() if name not in targets}
+
+        for i, generator in enumerate(node.generators):
+            if i > 0:
+                generator.iter = self.visitExpr(generator.iter)
+            self.visitTarget(generator.target)
+            generator.ifs = [self.visitExpr(test) for test in generator.ifs]
+        if isinstance(node, ast.DictComp):
+            node.key = self.visitExpr(node.key)
+            node.value = self.visitExpr(node.value)
+        else:
+            node.elt = self.visitExpr(node.elt)
+
+        self.values, self.inherited = outer
+
+    def visit_ListComp(self, node):
+        self.visitComprehension(node)
+        return node
+
+    def visit_SetComp(self, node):
+        self.visitComprehension(node)
+        return node
+
+    def visit_DictComp(self, node):
+        self.visitComprehension(node)
+        return node
+
+    def visit_GeneratorExp(self, node):
+        self.visitComprehension(node, lazy=True)
+        return node
@@ -1,59 +1,136 @@
 import ast
-from ast import Constant, Name, Load, UnaryOp, Not, JoinedStr, FormattedValue, List, Set, Dict, Tuple
-from typing import Optional, Iterable
+from ast import Name, Load, UnaryOp, Not, JoinedStr, FormattedValue, Module, Attribute
+from typing import Optional, Any
 
 from pyfastutil.objects import ObjectArrayList
 
+import Const
 from transformers.ITransformer import ITransformer
 from transformers.OptimizeLevel import OptimizeLevel
+from utils.ASTUtils import ASTUtils
+from utils.eval.EvalBudget import BudgetExceeded, EvalBudget
+from utils.eval.NameResolver import NameResolver
 from utils.eval.PureFunctions import PureFunctions
+from utils.eval.Sandbox import Sandbox
 
 
 class FunctionComputer(ITransformer):
+    # shared by all instances, the workers are started on the first call
+    sandbox: Optional[Sandbox] = None
+
     def __init__(self):
-        super().__init__("FunctionComputer", OptimizeLevel.O2)
+        super().__init__("FunctionComputer", OptimizeLevel.O2, fusible=True)
+        self.__resolver: Optional[NameResolver] = None
+
+    def _onPreTransform(self) -> None:
+        self.__resolver = None
+
+    def getResolver(self) -> NameResolver:
+        """
+        Index the names of the current module on the first call of a cycle,
+        and prefetch the sandbox calls of a module transformed the first time in a single batch.
+        """
+        if self.__resolver is None:
+            manager = Const.transManager
+            module = manager.getCurrentModule()
+            self.__resolver = NameResolver(module)
+            if manager.cycles.get(manager.getCurrentSource(), 0) <= 1:
+                self.prefetch(module)
+        return self.__resolver
+
+    @staticmethod
+    def getSandbox() -> Sandbox:
+        if FunctionComputer.sandbox is None:
+            FunctionComputer.sandbox = Sandbox()
+        return FunctionComputer.sandbox
+
+    def prefetch(self, module: Module) -> None:
+        calls = ObjectArrayList()
+        for node in ast.walk(module):
+            if isinstance(node, ast.Call):
+                name = self.__resolver.resolve(node.func)
+                if Sandbox.isAllowed(name):
+                    arguments = self.toArguments(node)
+                    if arguments is not None:
+                        calls.append((name, *arguments))
+        if len(calls) > 1:
+            # the outcomes are cached
+            self.getSandbox().callMany(list(calls))
 
     # noinspection PyTypeChecker
     def visit_Call(self, node):
-        if (isinstance(node.func, Name)
-                and isinstance(node.func.ctx, Load)):
-            result: Optional[ast.expr]
+        # fold the arguments first, they may become constants
+        self.generic_visit(node)
+
+        resolver = self.getResolver()
+        name = resolver.resolve(node.func)
+        arguments = self.toArguments(node)
+        if name is None and isinstance(node.func, Attribute) and arguments is not None:
+            # a method of a literal, like '",".join(...)', is called with the literal first
             try:
-                args = self.toConstantObj(node.args)
-                kwValues = self.toConstantObj(kw.value for kw in node.keywords)
-                if args is not None and kwValues is not None:
-                    result = PureFunctions.call(
-                        node.func.id,
-                        *(arg.value for arg in args),
-                        **{node.keywords[i].arg: kwValues[i].value for i in range(len(kwValues))}
-                    )
-                else:
-                    result = self.handleOther(node.func.id, node.args, node.keywords)
-            except Exception as e:
-                self.flag(e, node)
-                result = None
-
-            if result is not None:
-                # self.done()
-                return result
-
-        return self.generic_visit(node)
+                obj = ASTUtils.toValue(node.func.value)
+                name = f"{type(obj).__name__}.{node.func.attr}"
+                arguments = (obj, *arguments[0]), arguments[1]
+            except ValueError:
+                pass
+        if name is None:
+            return node
+
+        result: Optional[ast.expr] = None
+        try:
+            func = PureFunctions.get(name)
+            if arguments is None:
+                if isinstance(node.func, Name) and name == node.func.id:
+                    # a builtin, not shadowed
+                    result = self.handleOther(name, node.args, node.keywords)
+            elif func is not None:
+                if not func.lazy or resolver.resolve(Name(id="iter", ctx=Load())) == "iter":
+                    result = func.call(*arguments[0], **arguments[1])
+            elif Sandbox.isAllowed(name):
+                result = self.callSandbox(name, node, arguments)
+        except BudgetExceeded as e:
+            self.notice(str(e), node)
+            result = None
+        except Exception as e:
+            self.flag(e, node)
+            result = None
+
+        if result is not None:
+            self.done()
+            return result
+
+        return node
 
     @staticmethod
-    def toConstantObj(objs: Iterable[ast.expr]) -> Optional[list[Constant]]:
-        newObjs: list[Constant] = ObjectArrayList()
-        for obj in objs:
-            if isinstance(obj, List) or isinstance(obj, Set) or isinstance(obj, Dict) or isinstance(obj, Tuple):
-                nextObjs = FunctionComputer.toConstantObj(obj.elts)
-                if nextObjs is None:
-                    return None
-                newObjs.extend(nextObjs)
-            elif isinstance(obj, Constant):
-                newObjs.append(obj)
-            else:
+    def toArguments(node: ast.Call) -> Optional[tuple[tuple, dict[str, Any]]]:
+        """
+        :return: the values of the arguments of a call, or None if any isn't a literal.
+        """
+        try:
+            args = tuple(ASTUtils.toValue(arg) for arg in node.args)
+            if any(kw.arg is None for kw in node.keywords):
                 return None
+            kwargs = {kw.arg: ASTUtils.toValue(kw.value) for kw in node.keywords}
+        except ValueError:
+            return None
+        return args, kwargs
+
+    def callSandbox(self, name: str, node: ast.Call, arguments: tuple[tuple, dict[str, Any]]) -> Optional[ast.expr]:
+        """
+        Evaluate a call to the standard library in the sandbox.
 
-        return newObjs
+        :raise BudgetExceeded: if the result is too large to be written to the output.
+        """
+        outcome = self.getSandbox().call(name, *arguments)
+        match outcome:
+            case ("ok", value):
+                EvalBudget.checkResult(value)
+                return ASTUtils.toExpr(value)
+            case ("raise", typ, message):
+                self.flag(f"{typ}: {message}", node)
+            case ("fail", reason):
+                self.notice(f"{name}: {reason}", node)
+        return None
 
     # noinspection PyTypeChecker
     @staticmethod
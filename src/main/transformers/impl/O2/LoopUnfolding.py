@@ -1,5 +1,5 @@
 import ast
-from ast import Constant, Call, Assign, Module
+from ast import Constant, Call, Assign, Pass
 
 from pyfastutil.objects import ObjectArrayList
 from pylang_annotations import native
@@ -7,6 +7,7 @@ from pylang_annotations import native
 import Const
 from transformers.ITransformer import ITransformer
 from transformers.OptimizeLevel import OptimizeLevel
+from utils.ASTUtils import ASTUtils
 from utils.eval.RangeUtils import RangeUtils
 
 
@@ -39,12 +40,17 @@ class LoopUnfolding(ITransformer):
             body = ObjectArrayList()
 
             for i in range(start, end, step):
-                targetAssign = Assign(targets=[node.target], value=Constant(value=i))
-                body.append(targetAssign)
-                body.extend(node.body)
+                # every iteration owns its nodes, later transformers may modify them separately
+                targetAssign = Assign(targets=[ASTUtils.deepcopy(node.target)], value=Constant(value=i))
+                body.append(ast.copy_location(targetAssign, node))
+                body.extend([ASTUtils.deepcopy(stmt) for stmt in node.body if not isinstance(stmt, ast.Pass)])
 
             self.done()
-            return ast.copy_location(Module(body=body.to_list(), type_ignores=[]), node)
+            if len(body) == 0:
+                # the loop never runs, the target isn't assigned either
+                return ast.copy_location(Pass(), node)
+            # spliced into the enclosing body, a nested Module can be unparsed but not compiled
+            return body.to_list()
 
         return self.generic_visit(node)
 
@@ -33,7 +33,12 @@ class VariableRenamer(ITransformer):
         self.state = State.NONE
 
     def _onPreTransform(self) -> None:
+        # a run interrupted by the Watchdog may leave any state behind
+        self.bypassedVar = set()
+        self.mapping = {}
         self.assigned = len(VariableRenamer.NAME_MAP) ** 5
+        self.ignoring = False
+        self.state = State.NONE
 
     def visit_Name(self, node):
         match self.state:
@@ -53,7 +58,9 @@ class VariableRenamer(ITransformer):
                 if node.id not in self.mapping:
                     return self.generic_visit(node)
 
-                node.id = self.mapping[node.id]
+                if node.id != self.mapping[node.id]:
+                    node.id = self.mapping[node.id]
+                    self.markDirty()
 
         return self.generic_visit(node)
 
@@ -63,35 +70,35 @@ class VariableRenamer(ITransformer):
         outerAssigned = self.assigned
         outerState = self.state
 
-        self.state = State.NONE
-
-        for arg in node.args.args:
-            # works wrongly when call with kwargs
-            # newName = self.generateName()
-            newName = arg.arg
-            self.mapping[arg.arg] = newName
-            arg.arg = newName
+        try:
+            self.state = State.NONE
 
-        self.state = State.SEARCH
+            for arg in node.args.args:
+                # works wrongly when call with kwargs
+                # newName = self.generateName()
+                newName = arg.arg
+                self.mapping[arg.arg] = newName
+                arg.arg = newName
 
-        for expr in node.body:
-            if isinstance(expr, Global) or isinstance(expr, Nonlocal):
-                self.bypassedVar.update(expr.names)
-                continue
-            if isinstance(expr, FunctionDef):
-                continue
+            self.state = State.SEARCH
 
-            self.generic_visit(expr)
+            for expr in node.body:
+                if isinstance(expr, Global) or isinstance(expr, Nonlocal):
+                    self.bypassedVar.update(expr.names)
+                    continue
+                if isinstance(expr, FunctionDef):
+                    continue
 
-        self.state = State.REMAP
-        for expr in node.body:
-            self.generic_visit(expr)
+                self.generic_visit(expr)
 
-        self.state = State.NONE
-        self.bypassedVar = outerBypassed
-        self.mapping = outerMapping
-        # self.assigned = outerAssigned
-        self.state = outerState
+            self.state = State.REMAP
+            for expr in node.body:
+                self.generic_visit(expr)
+        finally:
+            self.bypassedVar = outerBypassed
+            self.mapping = outerMapping
+            # self.assigned = outerAssigned
+            self.state = outerState
 
         return self.generic_visit(node)
 
@@ -109,8 +116,10 @@ class VariableRenamer(ITransformer):
 
     def handleIgnore(self, node):
         self.ignoring = True
-        self.generic_visit(node)
-        self.ignoring = False
+        try:
+            self.generic_visit(node)
+        finally:
+            self.ignoring = False
         return node
 
     def generateName(self) -> str:
@@ -47,6 +47,8 @@ class NativeConvertor(ITransformer):
                 elif isinstance(expr, ImportFrom):
                     if not self.handleImportFrom(expr):
                         newBody.remove(expr)
+            if len(newBody) != len(node.body):
+                self.markDirty()
             node.body = newBody.to_list()
         except (AttributeError, Exception):
             ...
@@ -62,6 +64,7 @@ class NativeConvertor(ITransformer):
 
                 if len(node.names) > 1:
                     node.names.remove(alias)
+                    self.markDirty()
                     return True
                 else:
                     return False
@@ -78,6 +81,7 @@ class NativeConvertor(ITransformer):
 
                     if len(node.names) > 1:
                         node.names.remove(alias)
+                        self.markDirty()
                         return True
                     else:
                         return False
@@ -98,7 +102,8 @@ class NativeConvertor(ITransformer):
             self.logger.warn(f"Fail to compile {source.getFilename()}, skipped.")
             return self.generic_visit(node)
 
-        Const.transManager.sources.append(compiled)
+        Const.transManager.addSource(compiled)
+        self.markDirty()
 
         importName = compiled.getFilename().removesuffix('.pyd').removesuffix('.so')
         code = f"""
@@ -118,9 +123,11 @@ else:
     def handle_decorator(self, node: FunctionDef | ClassDef, expr: ast.expr) -> Optional[AST]:
         if isinstance(expr, Name) and expr.id in self.funcName:
             node.decorator_list.remove(expr)
+            self.markDirty()
             return self.tryConvert(node, False)
         if isinstance(expr, Call) and isinstance(expr.func, Name) and expr.func.id in self.funcName:
             node.decorator_list.remove(expr)
+            self.markDirty()
             onlyFunc = False
             if len(expr.args) > 0:
                 if len(expr.args) > 1:
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 import ast
+import math
 from ast import Name, Call, Lambda, Attribute, GeneratorExp, Load, Tuple, Store, Constant, List, Set, Dict, AST, \
-    FunctionDef, Expr
-from types import NoneType
+    FunctionDef
+from types import NoneType, EllipsisType
 from typing import overload, Optional, Collection, TYPE_CHECKING, TypeVar
 
 from pyfastutil.objects import ObjectArrayList
@@ -16,6 +17,10 @@ if TYPE_CHECKING:
 
 
 T = TypeVar("T", bound=AST)
+# nodes without fields, ast.parse shares a single instance of each of them
+SHARED_NODES = (ast.expr_context, ast.boolop, ast.operator, ast.unaryop, ast.cmpop)
+# attribute of an expression which is evaluated, but left in the tree as its value is too large to be a literal
+FOLDED_VALUE = "pylangFoldedValue"
 
 
 class ASTUtils:
@@ -77,7 +82,17 @@ class ASTUtils:
 
         typ = type(obj)
         try:
-            if typ in (int, float, str, NoneType, Ellipsis, NotImplemented):
+            if typ in (int, float):
+                if obj < 0 or (typ is float and math.copysign(1, obj) < 0):
+                    # a negative Constant is unparsed without parentheses, '(-1) ** 2' would become '-1 ** 2'
+                    return ast.UnaryOp(op=ast.USub(), operand=Constant(value=-obj))
+                return Constant(value=obj)
+            elif typ is complex:
+                # a negative zero part can't be written as a literal
+                if math.copysign(1, obj.real) < 0 or math.copysign(1, obj.imag) < 0:
+                    return None
+                return Constant(value=obj)
+            elif typ in (bool, str, bytes, NoneType, EllipsisType):
                 return Constant(value=obj)
             elif typ is list:
                 assert isinstance(obj, list)
@@ -89,7 +104,8 @@ class ASTUtils:
                 return Tuple(elts=values, ctx=Load())
             elif typ is set:
                 assert isinstance(obj, set)
-                values = collectionToElt(obj)
+                # the iteration order of a set changes with the hash seed, keep the output stable
+                values = collectionToElt(sorted(obj, key=repr))
                 return Set(elts=values)
             elif typ is dict:
                 assert isinstance(obj, dict)
@@ -100,6 +116,34 @@ class ASTUtils:
             ...
         return None
 
+    @staticmethod
+    def toValue(node: AST) -> object:
+        """
+        Get the value of a literal expression, like a Constant or a tuple of Constants.
+        Negative numbers are accepted in the form generated by toExpr, and so are the expressions with FOLDED_VALUE.
+
+        :raise ValueError: if the expression isn't a literal.
+        """
+        if isinstance(node, Constant):
+            return node.value
+        if FOLDED_VALUE in node.__dict__:
+            return node.__dict__[FOLDED_VALUE]
+        if (isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) and isinstance(node.operand, Constant)
+                and type(node.operand.value) in (int, float)):
+            return -node.operand.value
+        if isinstance(node, (Tuple, List)) and isinstance(node.ctx, Load):
+            values = [ASTUtils.toValue(elt) for elt in node.elts]
+            return tuple(values) if isinstance(node, Tuple) else values
+        try:
+            if isinstance(node, Set):
+                return {ASTUtils.toValue(elt) for elt in node.elts}
+            if isinstance(node, Dict) and None not in node.keys:
+                return {ASTUtils.toValue(key): ASTUtils.toValue(value) for key, value in zip(node.keys, node.values)}
+        except TypeError:
+            # unhashable elements or keys
+            pass
+        raise ValueError(f"not a literal: {type(node).__name__}")
+
     @staticmethod
     def toPyObject(engine: PredictEngine, obj: AST | object) -> PyObject:
         from utils.simulation.objects.PyConstant import PyConstant, T
@@ -120,12 +164,30 @@ class ASTUtils:
         return PyUnknown(engine)
 
     @staticmethod
-    def deepcopy(node: T) -> T:
-        assert isinstance(node, AST)
-
-        res = ast.parse(ast.unparse(node)).body[0]
-        if isinstance(node, ast.expr):
-            if isinstance(res, Expr):
-                return res.value
+    def deepcopy(node: T, shareConstants: bool = False) -> T:
+        """
+        Clone an AST subtree structurally, the locations are preserved.
+        Contexts and operators are immutable singletons, they are shared with the original tree.
 
-        return res
+        :param node: the subtree to clone, any kind of node is supported.
+        :param shareConstants: share the Constant nodes too, only if nobody modifies them in place.
+        """
+        assert isinstance(node, AST)
+        shared = SHARED_NODES + (Constant,) if shareConstants else SHARED_NODES
+
+        def clone(n: AST) -> AST:
+            if isinstance(n, shared):
+                return n
+
+            typ = type(n)
+            res = typ.__new__(typ)
+            fields = res.__dict__
+            for name, value in n.__dict__.items():
+                if isinstance(value, AST):
+                    value = clone(value)
+                elif type(value) is list:
+                    value = [clone(v) if isinstance(v, AST) else v for v in value]
+                fields[name] = value
+            return res
+
+        return clone(node)
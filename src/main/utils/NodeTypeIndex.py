@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import ast
+from ast import AST, NodeVisitor, NodeTransformer
+from collections import Counter
+from types import MappingProxyType
+from typing import Iterable, Mapping
+
+# key: the visitor class, see getVisitors
+_visitors: dict[type, Mapping[type, str]] = {}
+
+
+class NodeTypeIndex:
+    """
+    Histogram of the node types in a module, used to skip transformers that have nothing to visit.
+    """
+
+    def __init__(self, module: AST):
+        self.counts: Counter[type] = Counter(type(node) for node in ast.walk(module))
+
+    def containsAny(self, types: Iterable[type]) -> bool:
+        return any(self.counts[typ] > 0 for typ in types)
+
+    @staticmethod
+    def getVisitors(cls: type[NodeVisitor]) -> Mapping[type, str]:
+        """
+        Find the visit_XXX methods of a visitor class, without the ones inherited from NodeVisitor,
+        like its deprecated visit_Constant. Shared by the node type filter and FusedTransformer.
+
+        :param cls: the visitor class.
+        :return: key: the node type, value: the method name. cached per class, read only.
+        """
+        cached = _visitors.get(cls)
+        if cached is not None:
+            return cached
+
+        visitors: dict[type, str] = {}
+        for klass in cls.__mro__:
+            if klass in (NodeTransformer, NodeVisitor, object):
+                continue
+            for attr in vars(klass):
+                if not attr.startswith("visit_") or attr in visitors.values():
+                    continue
+                typ = getattr(ast, attr.removeprefix("visit_"), None)
+                if isinstance(typ, type) and issubclass(typ, AST):
+                    visitors[typ] = attr
+        cached = _visitors[cls] = MappingProxyType(visitors)
+        return cached
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import json
+import time
+import tracemalloc
+from ast import NodeTransformer
+from typing import Any, Optional
+
+from pyfastutil.objects import ObjectArrayList
+
+import Const
+from log.Logger import Logger
+
+
+class _Counter:
+    def __init__(self):
+        self.visited = 0
+        self.replaced = 0
+
+
+class Profiler:
+    """
+    Records the cost of every transformer run, keyed by (module, transformer, cycle).
+    """
+
+    def __init__(self, traceMemory: bool = False):
+        self.traceMemory = traceMemory
+        self.records: list[dict[str, Any]] = ObjectArrayList()
+
+        if self.traceMemory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def instrument(self, transformer: NodeTransformer) -> None:
+        """
+        Count the visited and replaced nodes of a transformer.
+        The instance attribute shadows the visit method, so nothing is paid if the profiler is disabled.
+        The counter is kept on the transformer, not by id, the id of a dropped FusedTransformer is reused.
+        """
+        if isinstance(getattr(transformer, "_profilerCounter", None), _Counter):
+            return
+        counter = _Counter()
+        transformer._profilerCounter = counter
+        visit = transformer.visit
+
+        def countingVisit(node):
+            counter.visited += 1
+            result = visit(node)
+            if result is not node:
+                counter.replaced += 1
+            return result
+
+        transformer.visit = countingVisit
+
+    def begin(self, transformer: NodeTransformer) -> tuple[float, int, int]:
+        """
+        Call before running an instrumented transformer.
+
+        :return: the state to pass to end.
+        """
+        if self.traceMemory:
+            tracemalloc.reset_peak()
+        counter: _Counter = getattr(transformer, "_profilerCounter")
+        return time.perf_counter(), counter.visited, counter.replaced
+
+    def end(self, state: tuple[float, int, int], transformer: NodeTransformer,
+            module: str, name: str, phase: str, cycle: int) -> None:
+        """
+        Call after running an instrumented transformer.
+
+        :param state: the value returned by begin.
+        :param transformer: the transformer.
+        :param module: the filepath of the module.
+        :param name: the name of the transformer.
+        :param phase: 'general' or 'post'.
+        :param cycle: the cycle of the module.
+        """
+        wallTime = time.perf_counter() - state[0]
+        counter: _Counter = getattr(transformer, "_profilerCounter")
+        record: dict[str, Any] = {
+            "module": module,
+            "transformer": name,
+            "phase": phase,
+            "cycle": cycle,
+            "time": wallTime,
+            "visited": counter.visited - state[1],
+            "replaced": counter.replaced - state[2]
+        }
+        if self.traceMemory:
+            record["peakMemory"] = tracemalloc.get_traced_memory()[1]
+        self.records.append(record)
+
+    def summarize(self) -> list[dict[str, Any]]:
+        """
+        Merge the records of the same module and transformer.
+
+        :return: the merged records, sorted by time in descending order.
+        """
+        merged: dict[tuple[str, str], dict[str, Any]] = {}
+        for record in self.records:
+            key = record["module"], record["transformer"]
+            entry = merged.get(key)
+            if entry is None:
+                entry = merged[key] = {
+                    "module": key[0], "transformer": key[1],
+                    "time": 0.0, "calls": 0, "visited": 0, "replaced": 0, "cycles": 0, "peakMemory": 0
+                }
+            entry["time"] += record["time"]
+            entry["calls"] += 1
+            entry["visited"] += record["visited"]
+            entry["replaced"] += record["replaced"]
+            if record["phase"] == "general":
+                entry["cycles"] = max(entry["cycles"], record["cycle"])
+            entry["peakMemory"] = max(entry["peakMemory"], record.get("peakMemory", 0))
+        return sorted(merged.values(), key=lambda e: e["time"], reverse=True)
+
+    def report(self, logger: Logger, top: int) -> None:
+        """
+        Log the most expensive (module, transformer) pairs as a table.
+        """
+        summary = self.summarize()
+        lines = ObjectArrayList()
+        lines.append(f"{'time(s)':>9} {'calls':>6} {'cycles':>6} {'visited':>10} {'replaced':>9}"
+                     f"{' peak(KB)' if self.traceMemory else ''}  transformer @ module")
+        for entry in summary[:top]:
+            line = (f"{entry['time']:>9.4f} {entry['calls']:>6} {entry['cycles']:>6} "
+                    f"{entry['visited']:>10} {entry['replaced']:>9}")
+            if self.traceMemory:
+                line += f" {entry['peakMemory'] // 1024:>8}"
+            lines.append(f"{line}  {entry['transformer']} @ {entry['module']}")
+        logger.info(f"Top {min(top, len(summary))} of {len(summary)} transformer runs:\n" + "\n".join(lines))
+
+    def dump(self, path: str, **meta: Any) -> None:
+        """
+        Write all records to a json file.
+
+        :param path: the json file.
+        :param meta: extra information saved with the records, like the optimize level.
+        """
+        data = {
+            "version": Const.VERSION,
+            **meta,
+            "peakMemory": self.peakMemory(),
+            "summary": self.summarize(),
+            "records": list(self.records)
+        }
+        with open(path, "w", encoding="UTF-8") as f:
+            json.dump(data, f, indent=2)
+
+    def peakMemory(self) -> Optional[int]:
+        if not self.traceMemory:
+            return None
+        return max((record["peakMemory"] for record in self.records), default=0)
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import ast
+import signal
+import threading
+import time
+from ast import Module
+from contextlib import contextmanager
+from typing import Optional, Iterator
+
+from utils.source.CodeSource import CodeSource
+
+
+class WatchdogTimeout(BaseException):
+    """
+    Raised in the transforming thread when a module runs out of time.
+    Not an Exception, so the transformers catching exceptions of evaluated code can't swallow it.
+    """
+
+
+class Watchdog:
+    """
+    Limit the time and the general transform cycles spent on every module, and detect modules which never converge
+    because the transformers undo each other's changes.
+
+    The time is only enforced inside a cycle if the watchdog runs on the main thread of a platform with
+    signal.setitimer, otherwise it's checked between cycles.
+    """
+    # the hashes of the first cycles aren't needed, nearly every module converges in a few cycles
+    OSCILLATION_CHECK_AFTER = 4
+
+    def __init__(self, maxTime: float, maxCycles: int):
+        """
+        :param maxTime: the max seconds spent on a module, no limit if 0.
+        :param maxCycles: the max general transform cycles of a module, no limit if 0.
+        """
+        self.maxTime = maxTime
+        self.maxCycles = maxCycles
+        self.__elapsed: dict[CodeSource, float] = {}
+        self.__hashes: dict[CodeSource, set[int]] = {}
+
+    def reset(self) -> None:
+        self.__elapsed = {}
+        self.__hashes = {}
+
+    @staticmethod
+    def __onAlarm(signum, frame):
+        raise WatchdogTimeout()
+
+    def canInterrupt(self) -> bool:
+        """
+        :return: true if a cycle may be interrupted in the middle, leaving a half transformed tree.
+        """
+        return (self.maxTime > 0 and hasattr(signal, "setitimer")
+                and threading.current_thread() is threading.main_thread())
+
+    @contextmanager
+    def guard(self, source: CodeSource) -> Iterator[None]:
+        """
+        Run a cycle of a module within the time left to it.
+
+        :raise WatchdogTimeout: if the module runs out of time.
+        """
+        elapsed = self.__elapsed.get(source, 0.0)
+        if self.maxTime <= 0:
+            yield
+            return
+        if elapsed >= self.maxTime:
+            raise WatchdogTimeout()
+
+        alarm = self.canInterrupt()
+        previousHandler = None
+        if alarm:
+            previousHandler = signal.signal(signal.SIGALRM, Watchdog.__onAlarm)
+            signal.setitimer(signal.ITIMER_REAL, self.maxTime - elapsed)
+        startTime = time.perf_counter()
+        try:
+            yield
+        finally:
+            if alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                signal.signal(signal.SIGALRM, previousHandler if previousHandler is not None else signal.SIG_DFL)
+            self.__elapsed[source] = elapsed + time.perf_counter() - startTime
+
+    def check(self, source: CodeSource, module: Module, cycle: int) -> Optional[str]:
+        """
+        Check a module after a cycle which changed it.
+
+        :param source: the source of the module.
+        :param module: the module after the cycle.
+        :param cycle: the count of cycles run on the module.
+        :return: the reason to stop transforming the module, or None to run another cycle.
+        """
+        if 0 < self.maxCycles <= cycle:
+            return f"not converged in {cycle} cycles"
+        if 0 < self.maxTime <= self.__elapsed.get(source, 0.0):
+            return f"took longer than {self.maxTime:g}s"
+        if cycle >= Watchdog.OSCILLATION_CHECK_AFTER:
+            hashes = self.__hashes.setdefault(source, set())
+            dumpHash = hash(ast.dump(module))
+            if dumpHash in hashes:
+                return f"oscillating after {cycle} cycles"
+            hashes.add(dumpHash)
+        return None
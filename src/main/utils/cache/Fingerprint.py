@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import Optional
+
+import Const
+
+# the folder of Pylang itself
+MAIN = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_sources: Optional[bytes] = None
+
+
+class Fingerprint:
+    """
+    Identify the optimizer which produced a cached result, a change to any of its sources or settings
+    invalidates the caches. See TransCache and PylangLoader.
+    """
+
+    @staticmethod
+    def sources() -> bytes:
+        """
+        The digest of the python sources of Pylang, computed once per process.
+        """
+        global _sources
+        if _sources is None:
+            digest = hashlib.sha256()
+            for root, dirs, files in os.walk(MAIN):
+                # walked in a stable order
+                dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+                for file in sorted(files):
+                    if not file.endswith(".py"):
+                        continue
+                    path = os.path.join(root, file)
+                    digest.update(os.path.relpath(path, MAIN).replace(os.sep, "/").encode("UTF-8"))
+                    digest.update(b"\0")
+                    try:
+                        with open(path, "rb") as f:
+                            digest.update(f.read())
+                    except OSError:
+                        pass
+                    digest.update(b"\0")
+            _sources = digest.digest()
+        return _sources
+
+    @staticmethod
+    def settings() -> str:
+        """
+        The tunables in Const and the C compiler, read on every call as they may be changed by the flags.
+        """
+        parts = [f"{name}={value!r}" for name, value in sorted(vars(Const).items())
+                 if name.isupper() and isinstance(value, (int, float, str))]
+        pylang = getattr(Const, "pylang", None)
+        parts.append(f"compiler={getattr(pylang, 'compilerPath', None)!r}")
+        return ";".join(parts)
+
+    @staticmethod
+    def get() -> bytes:
+        """
+        :return: the digest of the sources and the settings of the optimizer.
+        """
+        digest = hashlib.sha256(Fingerprint.sources())
+        digest.update(Fingerprint.settings().encode("UTF-8"))
+        return digest.digest()
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import ast
+import hashlib
+from ast import Module
+from collections import OrderedDict
+from typing import Optional, Iterable, Any
+
+import Const
+from transformers.OptimizeLevel import OptimizeLevel
+from utils.ASTUtils import ASTUtils
+from utils.cache.TransCache import TransCache
+from utils.source.CodeSource import CodeSource
+from utils.source.Source import Source
+
+
+class MemoryCache:
+    """
+    In-memory cache of transformed modules and parsed ASTs, kept by a long-running process like PylangServer.
+    It has the same interface as TransCache, and evicts the least recently used entries when it grows too big.
+    """
+    # a parsed AST takes roughly this many times the memory of its source code
+    AST_SIZE_FACTOR = 10
+
+    def __init__(self, maxSize: int = Const.CACHE_MAX_SIZE):
+        """
+        :param maxSize: the approximate maximum size of all entries in bytes.
+        """
+        self.maxSize = maxSize
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # key: cache key, value: (size, entry). the most recently used entries are at the end.
+        self.__entries: OrderedDict[str, tuple[int, Any]] = OrderedDict()
+
+    @staticmethod
+    def key(source: CodeSource, level: OptimizeLevel, transformers: Iterable[str]) -> str:
+        return TransCache.key(source, level, transformers)
+
+    def __get(self, key: str) -> Optional[Any]:
+        entry = self.__entries.get(key)
+        if entry is None:
+            return None
+        self.__entries.move_to_end(key)
+        return entry[1]
+
+    def __put(self, key: str, size: int, value: Any) -> None:
+        old = self.__entries.pop(key, None)
+        if old is not None:
+            self.size -= old[0]
+        self.__entries[key] = size, value
+        self.size += size
+
+    def load(self, key: str) -> Optional[tuple[str, list[Source]]]:
+        """
+        Find a cached result.
+
+        :param key: the cache key.
+        :return: the transformed code and the sources generated while transforming, or None if missed.
+        """
+        cached = self.__get(key)
+        if cached is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return cached
+
+    def store(self, key: str, code: str, extraSources: list[Source]) -> None:
+        """
+        Save a transformed result.
+
+        :param key: the cache key.
+        :param code: the transformed code.
+        :param extraSources: sources generated while transforming the module, like native libraries.
+        """
+        self.__put(key, len(code), (code, list(extraSources)))
+
+    def parseModule(self, source: CodeSource) -> Module:
+        """
+        Parse a source, the AST is reused if the same code was parsed before.
+        Transformers modify the tree in place, so a copy of the cached AST is returned.
+
+        :param source: the source to parse.
+        :return: the parsed module.
+        """
+        code = source.getSources()
+        key = "ast:" + hashlib.sha256(code.encode("UTF-8", "surrogatepass")).hexdigest()
+        module = self.__get(key)
+        if module is None:
+            module = ast.parse(code)
+            self.__put(key, len(code) * MemoryCache.AST_SIZE_FACTOR, module)
+        return ASTUtils.deepcopy(module)
+
+    def evict(self) -> int:
+        """
+        Remove the least recently used entries until the cache fits the maximum size.
+
+        :return: the count of removed entries.
+        """
+        removed = 0
+        while self.size > self.maxSize and len(self.__entries) > 0:
+            _, (size, _) = self.__entries.popitem(last=False)
+            self.size -= size
+            removed += 1
+        return removed
+
+    def clear(self) -> None:
+        self.__entries.clear()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self.__entries)
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import ast
+import hashlib
+import os
+import pickle
+from ast import Module
+from pathlib import Path
+from typing import Optional, Iterable
+
+from pyfastutil.objects import ObjectArrayList
+
+import Const
+from transformers.OptimizeLevel import OptimizeLevel
+from utils.cache.Fingerprint import Fingerprint
+from utils.source.CodeSource import CodeSource
+from utils.source.Source import Source
+
+
+class TransCache:
+    """
+    On-disk cache of transformed modules, shared between runs.
+    Entries are content addressed, and the least recently used entries are evicted when the cache grows too big.
+    """
+    SUFFIX = ".pylc"
+
+    def __init__(self, path: str, maxSize: int = Const.CACHE_MAX_SIZE):
+        """
+        :param path: the folder to store cache entries.
+        :param maxSize: the maximum size of all entries in bytes.
+        """
+        self.path = Path(path)
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def key(source: CodeSource, level: OptimizeLevel, transformers: Iterable[str]) -> str:
+        """
+        Compute the cache key of a source.
+
+        :param source: the source before transforming.
+        :param level: the optimize level.
+        :param transformers: names of the transformers enabled at this level.
+        :return: the hex digest identifying the transformed result.
+        """
+        # the result also depends on the optimizer itself
+        digest = hashlib.sha256(Fingerprint.get())
+        for part in (level.name, ",".join(sorted(transformers)), source.getFilepath()):
+            digest.update(part.encode("UTF-8"))
+            digest.update(b"\0")
+        digest.update(source.getSources().encode("UTF-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def parseModule(source: CodeSource) -> Module:
+        """
+        Parse a source, ASTs are not kept on disk.
+        """
+        return ast.parse(source.getSources())
+
+    def _entryPath(self, key: str) -> Path:
+        return Path(self.path, key + TransCache.SUFFIX)
+
+    def load(self, key: str) -> Optional[tuple[str, list[Source]]]:
+        """
+        Find a cached result.
+
+        :param key: the cache key.
+        :return: the transformed code and the sources generated while transforming, or None if missed.
+        """
+        path = self._entryPath(key)
+        try:
+            with open(path, "rb") as f:
+                code, extraSources = pickle.load(f)
+            # mark as recently used
+            os.utime(path)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError, AttributeError, ImportError):
+            # unreadable, or written by another version whose classes are gone
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return code, extraSources
+
+    def store(self, key: str, code: str, extraSources: list[Source]) -> None:
+        """
+        Save a transformed result.
+
+        :param key: the cache key.
+        :param code: the transformed code.
+        :param extraSources: sources generated while transforming the module, like native libraries.
+        """
+        path = self._entryPath(key)
+        tmpPath = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(tmpPath, "wb") as f:
+                pickle.dump((code, list(extraSources)), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpPath, path)
+        except OSError:
+            Const.logger.debug(f"Failed to write cache entry {path}.")
+
+    def evict(self) -> int:
+        """
+        Remove the least recently used entries until the cache fits the maximum size.
+
+        :return: the count of removed entries.
+        """
+        entries = ObjectArrayList()
+        totalSize = 0
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if not entry.name.endswith(TransCache.SUFFIX):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                totalSize += stat.st_size
+
+        removed = 0
+        if totalSize <= self.maxSize:
+            return removed
+
+        entries.sort()
+        for _, size, path in entries:
+            if totalSize <= self.maxSize:
+                break
+            try:
+                os.remove(path)
+                totalSize -= size
+                removed += 1
+            except OSError:
+                pass
+        return removed
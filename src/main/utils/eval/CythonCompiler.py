@@ -5,9 +5,7 @@ import sys
 from pathlib import Path
 from typing import Sequence, Optional
 
-import Cython.Build
 from pylang_annotations import native
-from setuptools import setup
 
 import Const
 from utils.source.CodeSource import CodeSource
@@ -22,6 +20,10 @@ class SetupModule:
         os.environ["CC"] = compiler
 
     def compile(self) -> None:
+        # slow to import, only needed while compiling
+        import Cython.Build
+        from setuptools import setup
+
         setup(
             ext_modules=Cython.Build.cythonize(self.modules),
             script_args=self.argv
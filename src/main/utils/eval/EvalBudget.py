@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import ast
+import math
+import operator
+import re
+from typing import Any, Callable
+
+import Const
+
+# CPython stores ints in 30-bit digits
+WORD_BITS = 30
+# decimal digits per bit
+LOG10_2 = 0.30103
+
+
+class BudgetExceeded(Exception):
+    """
+    Raised before evaluating an expression whose result or cost would exceed the budget.
+    """
+
+
+# the functions of the operator module which are binary operators
+OPERATORS: dict[Callable, ast.operator] = {
+    operator.add: ast.Add(), operator.concat: ast.Add(), operator.sub: ast.Sub(), operator.mul: ast.Mult(),
+    operator.truediv: ast.Div(), operator.floordiv: ast.FloorDiv(), operator.mod: ast.Mod(),
+    operator.pow: ast.Pow(), operator.matmul: ast.MatMult(), operator.lshift: ast.LShift(),
+    operator.rshift: ast.RShift(), operator.and_: ast.BitAnd(), operator.or_: ast.BitOr(),
+    operator.xor: ast.BitXor(),
+}
+# methods returning a string at least as long as their width argument
+PADDING = frozenset({str.center, str.ljust, str.rjust, str.zfill, bytes.center, bytes.ljust, bytes.rjust, bytes.zfill})
+
+
+class EvalBudget:
+    """
+    Predict the size of the result and the cost of evaluating constants before doing it,
+    so folding '"x" * 10 ** 9' or '2 ** 10 ** 8' neither hangs the optimizer nor bloats the output.
+
+    Sizes are the approximate length of the literal of a value, costs are counted in machine word operations.
+    An evaluation in C can't be interrupted, so the time is bounded by the predicted cost.
+    Results may be larger than the literals written to the output, like the '4 ** 10000' in '4 ** 10000 % 7'.
+    """
+    # widths and precisions in format specs, like '%10000d' or '{:>10000}'
+    FORMAT_NUMBER = re.compile(r"\d+")
+
+    @staticmethod
+    def digits(value: int) -> int:
+        return int(value.bit_length() * LOG10_2) + 1
+
+    @staticmethod
+    def words(value: int) -> int:
+        return value.bit_length() // WORD_BITS + 1
+
+    @staticmethod
+    def sizeOf(value: object, limit: int = Const.FOLD_MAX_SIZE) -> int:
+        """
+        Estimate the length of the literal of a value, counting stops as soon as the limit is exceeded.
+        """
+        typ = type(value)
+        if typ in (str, bytes):
+            return len(value) + 2
+        if typ is int:
+            return EvalBudget.digits(value)
+        if typ is range:
+            # as materialized by a call like list(range(n)), len() may overflow
+            count = max(0, (value.stop - value.start) // value.step)
+            return count * (max(EvalBudget.digits(value.start), EvalBudget.digits(value.stop)) + 2)
+        if typ in (tuple, list, set, frozenset, dict):
+            total = 2
+            for item in (value.items() if typ is dict else value):
+                total += EvalBudget.sizeOf(item, limit - total) + 2
+                if total > limit:
+                    break
+            return total
+        return 8
+
+    @staticmethod
+    def check(size: int, cost: int) -> None:
+        """
+        :raise BudgetExceeded: if the predicted size or cost exceeds the budget.
+        """
+        if size > Const.FOLD_MAX_SIZE:
+            raise BudgetExceeded(f"the result would have about {size} chars (limit {Const.FOLD_MAX_SIZE}).")
+        if cost > Const.FOLD_MAX_COST:
+            raise BudgetExceeded(f"the evaluation would cost about {cost} operations (limit {Const.FOLD_MAX_COST}).")
+
+    @staticmethod
+    def checkResult(value: object) -> None:
+        """
+        :raise BudgetExceeded: if the literal of an evaluated value is too large to be written to the output.
+        """
+        size = EvalBudget.sizeOf(value, Const.FOLD_MAX_LITERAL_SIZE)
+        if size > Const.FOLD_MAX_LITERAL_SIZE:
+            raise BudgetExceeded(f"the result has more than {Const.FOLD_MAX_LITERAL_SIZE} chars.")
+
+    @staticmethod
+    def checkFormat(value: object, spec: str) -> None:
+        """
+        Check formatting a value, like '"%10d" % value' or 'f"{value:10}"'.
+        """
+        width = max((int(number) for number in EvalBudget.FORMAT_NUMBER.findall(spec)), default=0)
+        size = EvalBudget.sizeOf(value) + len(spec) + width
+        EvalBudget.check(size, size)
+
+    @staticmethod
+    def checkBinOp(op: ast.operator, left: Any, right: Any) -> None:
+        """
+        :raise BudgetExceeded: if evaluating the operation is over budget.
+        """
+        intLeft = type(left) in (int, bool)
+        intRight = type(right) in (int, bool)
+        if intLeft and intRight:
+            EvalBudget.checkIntOp(op, int(left), int(right))
+            return
+
+        match type(op):
+            case ast.Mult:
+                # repeating a sequence
+                if intLeft != intRight:
+                    sequence, count = (right, left) if intLeft else (left, right)
+                    # without the quotes or brackets, which aren't repeated
+                    size = (EvalBudget.sizeOf(sequence) - 2) * max(0, count) + 2
+                    EvalBudget.check(size, size)
+                    return
+            case ast.Mod:
+                if isinstance(left, (str, bytes)):
+                    EvalBudget.checkFormat(right, str(left))
+                    return
+
+        # the result is about as large as the operands
+        size = EvalBudget.sizeOf(left) + EvalBudget.sizeOf(right)
+        EvalBudget.check(size, size)
+
+    @staticmethod
+    def checkIntOp(op: ast.operator, left: int, right: int) -> None:
+        leftWords, rightWords = EvalBudget.words(left), EvalBudget.words(right)
+        size = max(EvalBudget.digits(left), EvalBudget.digits(right)) + 1
+        cost = max(leftWords, rightWords)
+
+        match type(op):
+            case ast.Mult:
+                size = EvalBudget.digits(left) + EvalBudget.digits(right)
+                cost = leftWords * rightWords
+            case ast.Pow:
+                if right > 0 and abs(left) > 1:
+                    # may be inf for huge exponents
+                    bits = int(min(math.log2(abs(left)) * right, 2 ** 62)) + 1
+                    size = int(bits * LOG10_2) + 1
+                    # repeated squaring, the last multiplication dominates
+                    cost = (bits // WORD_BITS + 1) ** 2
+            case ast.LShift:
+                if right > 0 and left != 0:
+                    bits = left.bit_length() + right
+                    size = int(bits * LOG10_2) + 1
+                    cost = bits // WORD_BITS + 1
+            case ast.FloorDiv | ast.Mod | ast.Div:
+                cost = leftWords * rightWords
+        EvalBudget.check(size, cost)
+
+    @staticmethod
+    def checkCall(func: Callable, args: tuple, kwargs: dict[str, Any]) -> None:
+        """
+        :raise BudgetExceeded: if calling a pure function is over budget.
+        """
+        if func is pow and len(args) == 2:
+            EvalBudget.checkBinOp(ast.Pow(), args[0], args[1])
+            return
+        if func is pow and len(args) == 3 and all(type(arg) is int for arg in args):
+            # modular power, the operands never grow larger than the modulus
+            EvalBudget.check(EvalBudget.digits(args[2]), EvalBudget.words(args[2]) ** 2 * args[1].bit_length())
+            return
+
+        if func in OPERATORS and len(args) == 2:
+            EvalBudget.checkBinOp(OPERATORS[func], args[0], args[1])
+            return
+        if func in PADDING and len(args) >= 2 and type(args[1]) is int:
+            size = max(EvalBudget.sizeOf(args[0]), args[1])
+            EvalBudget.check(size, size)
+            return
+        if func in (str.replace, bytes.replace) and len(args) >= 3:
+            # every gap between the chars may be replaced, like 'abc'.replace('', 'x')
+            size = EvalBudget.sizeOf(args[0]) * (EvalBudget.sizeOf(args[2]) + 1)
+            EvalBudget.check(size, size)
+            return
+        if func in (str.expandtabs, bytes.expandtabs):
+            tabSize = args[1] if len(args) >= 2 else kwargs.get("tabsize", 8)
+            size = EvalBudget.sizeOf(args[0]) * max(1, tabSize if type(tabSize) is int else 1)
+            EvalBudget.check(size, size)
+            return
+
+        size = sum(EvalBudget.sizeOf(arg) for arg in (*args, *kwargs.values()))
+        # about n log n for sorting, linear for the others
+        EvalBudget.check(size, size * max(1, size.bit_length()))
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import ast
+import builtins
+from ast import Module, Import, ImportFrom, Name, Attribute
+from typing import Optional
+
+
+class NameResolver:
+    """
+    Find the qualified names of the objects used in a module, like 'math.sqrt' for 'm.sqrt' after 'import math as m'.
+    Builtins are named without module, like 'len' or 'int.from_bytes'.
+
+    Only names bound nowhere in the module, or only by a single top-level import, are resolved.
+    Nothing is resolved if the module has a star import.
+    """
+    BUILTINS = frozenset(dir(builtins))
+
+    def __init__(self, module: Module):
+        # key: the local name, value: the qualified name
+        self.imports: dict[str, str] = {}
+        # count of bindings of every name in any scope
+        self.bound: dict[str, int] = {}
+        self.starImport = False
+
+        for node in ast.walk(module):
+            match node:
+                case Name(ctx=ast.Store() | ast.Del()):
+                    self.bind(node.id)
+                case ast.FunctionDef() | ast.AsyncFunctionDef() | ast.ClassDef():
+                    self.bind(node.name)
+                case ast.arg():
+                    self.bind(node.arg)
+                case ast.ExceptHandler(name=str()) | ast.MatchAs(name=str()) | ast.MatchStar(name=str()):
+                    self.bind(node.name)
+                case ast.MatchMapping(rest=str()):
+                    self.bind(node.rest)
+                case ast.Global() | ast.Nonlocal():
+                    for name in node.names:
+                        self.bind(name)
+                case Import() | ImportFrom():
+                    for alias in node.names:
+                        if alias.name == "*":
+                            self.starImport = True
+                        else:
+                            self.bind(alias.asname or alias.name.split(".")[0])
+
+        for stmt in module.body:
+            if isinstance(stmt, Import):
+                for alias in stmt.names:
+                    if alias.asname is not None:
+                        self.imports[alias.asname] = alias.name
+                    else:
+                        # 'import os.path' binds 'os'
+                        top = alias.name.split(".")[0]
+                        self.imports[top] = top
+            elif isinstance(stmt, ImportFrom) and stmt.level == 0 and stmt.module is not None:
+                for alias in stmt.names:
+                    self.imports[alias.asname or alias.name] = f"{stmt.module}.{alias.name}"
+        # rebound somewhere else, or imported twice
+        self.imports = {name: qualname for name, qualname in self.imports.items() if self.bound.get(name) == 1}
+
+    def bind(self, name: str) -> None:
+        self.bound[name] = self.bound.get(name, 0) + 1
+
+    def resolve(self, expr: ast.expr) -> Optional[str]:
+        """
+        :param expr: a Name or a chain of Attributes on a Name.
+        :return: the qualified name, or None if unknown.
+        """
+        if self.starImport:
+            return None
+        if isinstance(expr, Name):
+            if expr.id in self.imports:
+                return self.imports[expr.id]
+            if expr.id in NameResolver.BUILTINS and expr.id not in self.bound:
+                return expr.id
+            return None
+        if isinstance(expr, Attribute):
+            base = self.resolve(expr.value)
+            return None if base is None else f"{base}.{expr.attr}"
+        return None
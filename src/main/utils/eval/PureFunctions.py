@@ -1,38 +1,73 @@
 from __future__ import annotations
 
 import ast
+import importlib
 import math
 import typing
-from ast import Expr, Constant
 from typing import Callable, TypeVar, Optional, Any
 
 from pylang_annotations import native
 
+from utils.ASTUtils import ASTUtils
+from utils.eval.EvalBudget import EvalBudget
+
 T = TypeVar("T", bound=Any)
+# key: the qualified name, like 'abs', 'math.sqrt' or 'str.upper'
 _pure_functions: dict[str, _PureFunction] = {}
+_pure_callables: set[Callable] = set()
 
 
 @native
 class _PureFunction:
-    def __init__(self, func: Callable[..., T], toAST: Callable[[T], ast.expr] = None):
+    def __init__(self, func: Callable[..., T], toAST: Callable[[T], ast.expr] = None, name: str = None,
+                 lazy: bool = False):
+        """
+        :param func: the function.
+        :param toAST: converts a result to an expression, defaults to ASTUtils.toExpr.
+        :param name: the qualified name, defaults to the name of the function.
+        :param lazy: if the function returns an iterator, it's materialized as 'iter((...))'.
+        """
         self._func = func
         self._toAST = toAST
-        _pure_functions[self._func.__name__] = self
+        self.name = func.__name__ if name is None else name
+        self.lazy = lazy
+        _pure_functions[self.name] = self
+        _pure_callables.add(func)
+
+    @staticmethod
+    def ofModule(module: str, *names: str) -> tuple[_PureFunction, ...]:
+        """
+        Register functions of a module, the functions missing in this Python version are skipped.
+        """
+        mod = importlib.import_module(module)
+        return tuple(_PureFunction(getattr(mod, name), name=f"{module}.{name}")
+                     for name in names if hasattr(mod, name))
+
+    @staticmethod
+    def ofMethods(typ: type, *names: str) -> tuple[_PureFunction, ...]:
+        """
+        Register methods of a type, called like 'str.upper("a")' or '"a".upper()'.
+        """
+        return tuple(_PureFunction(getattr(typ, name), name=f"{typ.__name__}.{name}")
+                     for name in names if hasattr(typ, name))
 
     def getFunc(self):
         return self._func
 
     def call(self, *args, **kwargs) -> Optional[ast.expr]:
+        EvalBudget.checkCall(self._func, args, kwargs)
         pyRes = self._func(*args, **kwargs)
+        if self.lazy:
+            # the size of the result is bounded by the arguments checked above
+            pyRes = tuple(pyRes)
+        EvalBudget.checkResult(pyRes)
         if self._toAST is not None:
             return self._toAST(pyRes)
 
-        try:
-            expr = ast.parse(str(pyRes)).body[0]
-            assert isinstance(expr, Expr)
-            return expr.value
-        except (SyntaxError, AssertionError, TypeError, ValueError, Exception):
-            return None
+        expr = ASTUtils.toExpr(pyRes)
+        if expr is not None and self.lazy:
+            return ast.Call(func=ast.Name(id="iter", ctx=ast.Load()), args=[expr], keywords=[])
+        return expr
 
 
 INF: ast.expr = typing.cast(ast.Expr, ast.parse("__import__('math').inf").body[0]).value
@@ -51,7 +86,7 @@ class PureFunctions:
 
     STR = _PureFunction(str)
     INT = _PureFunction(int)
-    FLOAT = _PureFunction(float, lambda f: INF if math.isinf(f) else NAN if math.isnan(f) else Constant(value=f))
+    FLOAT = _PureFunction(float, lambda f: INF if math.isinf(f) else NAN if math.isnan(f) else ASTUtils.toExpr(f))
     BOOL = _PureFunction(bool)
     TUPLE = _PureFunction(tuple)
     LIST = _PureFunction(list)
@@ -62,21 +97,62 @@ class PureFunctions:
     SORTED = _PureFunction(sorted)
     ALL = _PureFunction(all)
     ANY = _PureFunction(any)
-
-    # ZIP = _PureFunction(zip, _generatorToAST)
+    CHR = _PureFunction(chr)
+    ORD = _PureFunction(ord)
+    HEX = _PureFunction(hex)
+    OCT = _PureFunction(oct)
+    BIN = _PureFunction(bin)
+    REPR = _PureFunction(repr)
+    ASCII = _PureFunction(ascii)
+
+    ZIP = _PureFunction(zip, lazy=True)
+    REVERSED = _PureFunction(reversed, lazy=True)
+    ENUMERATE = _PureFunction(enumerate, lazy=True)
     # MAP = _PureFunction(map, _generatorToAST)
     # FILTER = _PureFunction(filter, _generatorToAST)
-    # REVERSED = _PureFunction(reversed, _generatorToAST)
-    # ENUMERATE = _PureFunction(enumerate, _generatorToAST)
+
+    # the expensive ones, like math.factorial, are evaluated in the Sandbox
+    MATH = _PureFunction.ofModule(
+        "math", "sqrt", "cbrt", "exp", "exp2", "expm1", "log", "log2", "log10", "log1p", "pow",
+        "floor", "ceil", "trunc", "fabs", "fmod", "remainder", "copysign", "hypot", "dist", "degrees", "radians",
+        "sin", "cos", "tan", "asin", "acos", "atan", "atan2", "sinh", "cosh", "tanh", "asinh", "acosh", "atanh",
+        "isclose", "isfinite", "isinf", "isnan", "ldexp", "frexp", "modf")
+    OPERATOR = _PureFunction.ofModule(
+        "operator", "add", "sub", "mul", "truediv", "floordiv", "mod", "pow", "matmul", "lshift", "rshift",
+        "and_", "or_", "xor", "concat", "neg", "pos", "abs", "invert", "not_", "truth", "index",
+        "eq", "ne", "lt", "le", "gt", "ge", "is_", "is_not", "contains", "countOf", "indexOf", "getitem")
+    STRING = _PureFunction.ofModule("string", "capwords")
+
+    STR_METHODS = _PureFunction.ofMethods(
+        str, "upper", "lower", "casefold", "capitalize", "title", "swapcase", "strip", "lstrip", "rstrip",
+        "split", "rsplit", "splitlines", "join", "replace", "removeprefix", "removesuffix", "partition", "rpartition",
+        "startswith", "endswith", "find", "rfind", "index", "rindex", "count", "center", "ljust", "rjust", "zfill",
+        "expandtabs", "encode", "isalnum", "isalpha", "isascii", "isdecimal", "isdigit", "isidentifier",
+        "islower", "isnumeric", "isprintable", "isspace", "istitle", "isupper")
+    BYTES_METHODS = _PureFunction.ofMethods(
+        bytes, "upper", "lower", "capitalize", "title", "swapcase", "strip", "lstrip", "rstrip",
+        "split", "rsplit", "splitlines", "join", "replace", "removeprefix", "removesuffix", "partition", "rpartition",
+        "startswith", "endswith", "find", "rfind", "index", "rindex", "count", "center", "ljust", "rjust", "zfill",
+        "expandtabs", "decode", "hex", "isalnum", "isalpha", "isascii", "isdigit", "islower",
+        "isspace", "istitle", "isupper")
+    TUPLE_METHODS = _PureFunction.ofMethods(tuple, "count", "index")
+
+    @staticmethod
+    def get(name: str) -> Optional[_PureFunction]:
+        """
+        :param name: the qualified name of the function, see NameResolver.
+        """
+        return _pure_functions.get(name, None)
 
     @staticmethod
     def call(name: str, *args, **kwargs) -> Optional[ast.expr]:
         """
         Try to find and call the function with args
         maybe throw exception
-        :param name: the name of the function
-        :param args: args to call function
+        :param name: the qualified name of the function, like 'abs', 'math.sqrt' or 'str.upper'
+        :param args: args to call function, the object first for a method
         :return: the ast node with the result
+        :raise BudgetExceeded: if the evaluation is over budget, the function isn't called.
         """
         func = _pure_functions.get(name, None)
         if func is None:
@@ -86,4 +162,8 @@ class PureFunctions:
 
     @staticmethod
     def isPure(func: Callable) -> bool:
-        return any(func is f.getFunc() for f in _pure_functions.values())
+        try:
+            return func in _pure_callables
+        except TypeError:
+            # unhashable
+            return False
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import atexit
+import marshal
+import multiprocessing
+import time
+from collections import OrderedDict
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import Optional, Any
+
+from pyfastutil.objects import ObjectArrayList
+
+import Const
+from utils.eval.SandboxWorker import SandboxWorker
+
+# (name, args, kwargs)
+Call = tuple[str, tuple, dict[str, Any]]
+# not cached, the call may succeed in a new worker
+DIED = "fail", "the sandbox worker died"
+
+
+class _Worker:
+    def __init__(self, context: Any, memory: int):
+        self.context = context
+        self.memory = memory
+        self.process: Optional[BaseProcess] = None
+        self.connection: Optional[Connection] = None
+
+    def isAlive(self) -> bool:
+        return self.process is not None
+
+    def start(self) -> None:
+        connection, childConnection = self.context.Pipe()
+        self.process = self.context.Process(target=SandboxWorker.run, args=(childConnection, self.memory),
+                                            name="PylangSandbox", daemon=True)
+        self.process.start()
+        childConnection.close()
+        self.connection = connection
+
+    def send(self, calls: list[Call]) -> None:
+        self.connection.send_bytes(marshal.dumps(calls))
+
+    def receive(self, timeout: float) -> Optional[list[tuple]]:
+        """
+        :return: the outcomes, or None if the worker didn't answer in time.
+        :raise EOFError: if the worker died.
+        """
+        if not self.connection.poll(max(0.0, timeout)):
+            return None
+        return marshal.loads(self.connection.recv_bytes())
+
+    def kill(self) -> None:
+        if self.process is None:
+            return
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+        self.process = None
+        self.connection = None
+
+    def close(self) -> None:
+        if self.process is None:
+            return
+        # the worker exits when the connection is closed
+        self.connection.close()
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.process = None
+        self.connection = None
+
+
+class Sandbox:
+    """
+    Evaluate calls to pure functions of the standard library in a pool of worker subprocesses,
+    so a call which hangs, crashes or exhausts the memory can't take the optimizer down with it.
+
+    Arguments and results are marshalled, so only the values marshal supports are passed.
+    The workers are started on demand and kept warm, a batch of calls is spread over them to amortize the IPC.
+    The outcomes are cached by the qualified name of the function and the arguments.
+
+    An outcome is ("ok", value), ("raise", exception type, message) if the call raised,
+    or ("fail", reason) if it couldn't be evaluated.
+    """
+    # deterministic functions without side effects, by qualified name, see NameResolver
+    # the cheap ones, like math.sqrt, are evaluated in process, see PureFunctions
+    FUNCTIONS = frozenset({
+        "math.factorial", "math.comb", "math.perm", "math.gcd", "math.lcm", "math.isqrt", "math.prod", "math.fsum",
+        "struct.pack", "struct.unpack", "struct.calcsize",
+        "re.escape",
+        "int.from_bytes", "bytes.fromhex",
+        "zlib.crc32", "zlib.adler32",
+        "binascii.crc32", "binascii.hexlify", "binascii.unhexlify",
+        "unicodedata.name", "unicodedata.lookup", "unicodedata.category", "unicodedata.normalize",
+    })
+
+    def __init__(self, workers: int = Const.SANDBOX_WORKERS, timeout: float = Const.SANDBOX_TIMEOUT,
+                 memory: int = Const.SANDBOX_MEMORY, cacheSize: int = Const.SANDBOX_CACHE_SIZE):
+        """
+        :param workers: the max count of worker subprocesses.
+        :param timeout: the max seconds a batch of calls may take.
+        :param memory: the max bytes of address space of a worker, no limit if 0.
+        :param cacheSize: the max count of cached outcomes.
+        """
+        self.timeout = timeout
+        self.cacheSize = cacheSize
+        # spawned instead of forked, a fork would share the memory of the optimizer and break the memory limit
+        context = multiprocessing.get_context("spawn")
+        self.__workers = [_Worker(context, memory) for _ in range(max(1, workers))]
+        self.__cache: OrderedDict[bytes, tuple] = OrderedDict()
+        # the reason if no worker can be started, like inside a daemon process
+        self.__disabled: Optional[str] = None
+        self.__registered = False
+
+    @staticmethod
+    def isAllowed(name: Optional[str]) -> bool:
+        return name in Sandbox.FUNCTIONS
+
+    def call(self, name: str, args: tuple, kwargs: dict[str, Any]) -> tuple:
+        """
+        Evaluate a single call, see callMany.
+        """
+        return self.callMany([(name, args, kwargs)])[0]
+
+    def callMany(self, calls: list[Call]) -> list[tuple]:
+        """
+        Evaluate a batch of calls, the calls not cached are evaluated in parallel.
+
+        :param calls: the calls, the names must be allowed.
+        :return: the outcomes, in the order of the calls.
+        """
+        outcomes: list[Optional[tuple]] = [None] * len(calls)
+        pending: dict[bytes, list[int]] = {}
+        for i, (name, args, kwargs) in enumerate(calls):
+            if name not in Sandbox.FUNCTIONS:
+                outcomes[i] = "fail", f"{name} isn't allowed in the sandbox"
+                continue
+            try:
+                # sorted, so the keyword order doesn't matter
+                key = marshal.dumps((name, tuple(args), tuple(sorted(kwargs.items()))))
+            except ValueError:
+                outcomes[i] = "fail", "the arguments can't be marshalled"
+                continue
+            cached = self.__cache.get(key)
+            if cached is not None:
+                self.__cache.move_to_end(key)
+                outcomes[i] = cached
+            else:
+                pending.setdefault(key, []).append(i)
+
+        if len(pending) > 0:
+            keys = list(pending.keys())
+            results = self.__evaluate([calls[pending[key][0]] for key in keys])
+            for key, outcome in zip(keys, results):
+                if outcome != DIED:
+                    self.__cache[key] = outcome
+                for i in pending[key]:
+                    outcomes[i] = outcome
+            while len(self.__cache) > self.cacheSize:
+                self.__cache.popitem(last=False)
+
+        return outcomes
+
+    def __evaluate(self, calls: list[Call]) -> list[tuple]:
+        if self.__disabled is None and not self.__registered:
+            self.__registered = True
+            atexit.register(self.close)
+
+        workers = self.__workers[:min(len(self.__workers), len(calls))]
+        for worker in workers:
+            if self.__disabled is None and not worker.isAlive():
+                try:
+                    worker.start()
+                except Exception as e:
+                    self.__disabled = f"can't start a sandbox: {e}"
+        if self.__disabled is not None:
+            return [("fail", self.__disabled)] * len(calls)
+
+        try:
+            return self.__evaluateOn(workers, calls)
+        except BaseException:
+            # interrupted, like by the Watchdog, an answer left in a pipe would be read as the outcome of a later call
+            for worker in workers:
+                worker.kill()
+            raise
+
+    def __evaluateOn(self, workers: list[_Worker], calls: list[Call]) -> list[tuple]:
+        # round-robin, every worker gets a batch
+        batches = [list(range(i, len(calls), len(workers))) for i in range(len(workers))]
+        outcomes: list[Optional[tuple]] = [None] * len(calls)
+        sent = ObjectArrayList()
+        for worker, batch in zip(workers, batches):
+            try:
+                worker.send([calls[i] for i in batch])
+                sent.append((worker, batch))
+            except (OSError, ValueError):
+                worker.kill()
+                for i in batch:
+                    outcomes[i] = DIED
+
+        deadline = time.monotonic() + self.timeout
+        for worker, batch in sent:
+            try:
+                results = worker.receive(deadline - time.monotonic())
+            except (EOFError, OSError):
+                worker.kill()
+                results = [DIED] * len(batch)
+            if results is None:
+                # one of the calls hangs, find it by evaluating them one by one
+                worker.kill()
+                results = [self.__evaluateAlone(worker, calls[i]) for i in batch] if len(batch) > 1 \
+                    else [("fail", f"took longer than {self.timeout:g}s")]
+            for i, outcome in zip(batch, results):
+                outcomes[i] = outcome
+
+        return outcomes
+
+    def __evaluateAlone(self, worker: _Worker, call: Call) -> tuple:
+        try:
+            if not worker.isAlive():
+                worker.start()
+            worker.send([call])
+            results = worker.receive(self.timeout)
+        except (EOFError, OSError, ValueError):
+            worker.kill()
+            return DIED
+        if results is None:
+            worker.kill()
+            return "fail", f"took longer than {self.timeout:g}s"
+        return results[0]
+
+    def close(self) -> None:
+        """
+        Stop the workers, they're started again on demand.
+        """
+        for worker in self.__workers:
+            worker.close()
+        if self.__registered:
+            self.__registered = False
+            atexit.unregister(self.close)
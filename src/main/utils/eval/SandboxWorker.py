@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import builtins
+import importlib
+import marshal
+from multiprocessing.connection import Connection
+from typing import Callable
+
+
+class SandboxWorker:
+    """
+    The entry of a sandbox subprocess, see Sandbox.
+    Only imports the standard library itself, but a spawned process also imports the __main__ module of the optimizer,
+    like Pylang.py, as __mp_main__. Starting a worker costs about as much as starting Pylang, so the workers are kept
+    warm by the Sandbox.
+    """
+
+    @staticmethod
+    def run(connection: Connection, memory: int) -> None:
+        """
+        Evaluate the batches of calls received until the connection is closed.
+
+        :param connection: receives the marshalled list of (name, args, kwargs), sends the list of outcomes.
+        :param memory: the max bytes of address space of the worker, no limit if 0.
+        """
+        if memory > 0:
+            try:
+                import resource
+                resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+            except (ImportError, ValueError, OSError):
+                # not supported by the platform, the worker still runs out of process
+                pass
+
+        functions: dict[str, Callable] = {}
+        while True:
+            try:
+                calls = marshal.loads(connection.recv_bytes())
+            except (EOFError, OSError):
+                return
+            outcomes = [SandboxWorker.call(functions, name, args, kwargs) for name, args, kwargs in calls]
+            connection.send_bytes(marshal.dumps(outcomes))
+
+    @staticmethod
+    def call(functions: dict[str, Callable], name: str, args: tuple, kwargs: dict) -> tuple:
+        """
+        :return: ("ok", value), ("raise", exception type, message) or ("fail", reason).
+        """
+        try:
+            func = functions.get(name)
+            if func is None:
+                func = functions[name] = SandboxWorker.resolve(name)
+        except (ImportError, AttributeError) as e:
+            return "fail", f"can't find {name}: {e}"
+
+        try:
+            value = func(*args, **kwargs)
+        except MemoryError:
+            return "fail", "out of memory"
+        except Exception as e:
+            return "raise", type(e).__name__, str(e)
+
+        try:
+            # the whole batch fails to marshal if a single value can't
+            marshal.dumps(value)
+        except ValueError:
+            return "fail", f"can't marshal a result of type {type(value).__name__}"
+        return "ok", value
+
+    @staticmethod
+    def resolve(name: str) -> Callable:
+        """
+        Find a function by qualified name, like 'math.factorial' or 'int.from_bytes'.
+        """
+        parts = name.split(".")
+        obj: object = builtins
+        start = 0
+        # the longest importable prefix is the module
+        for end in range(len(parts) - 1, 0, -1):
+            try:
+                obj = importlib.import_module(".".join(parts[:end]))
+                start = end
+                break
+            except ImportError:
+                continue
+        for part in parts[start:]:
+            obj = getattr(obj, part)
+        return obj
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import importlib.util
+import marshal
+from dataclasses import dataclass
+from types import CodeType
+
+from utils.source.Source import Source, T
+
+
+@dataclass(frozen=True)
+class BytecodeSource(Source):
+    """
+    A compiled module, written as a pyc file which is imported without its source.
+    """
+    # PEP 552 flags: hash based, unchecked. the pyc doesn't depend on the build time, and there's no source to check.
+    FLAGS = 0b01
+
+    __filepath: str
+    __code: CodeType
+    # the hash of the source the code is compiled from
+    __sourceHash: bytes
+
+    @staticmethod
+    def compile(filepath: str, code: CodeType, source: bytes) -> BytecodeSource:
+        """
+        :param filepath: the path of the .py file, the pyc file is placed beside it.
+        :param code: the compiled module.
+        :param source: the code the module is compiled from.
+        """
+        return BytecodeSource(filepath.removesuffix(".py") + ".pyc", code, importlib.util.source_hash(source))
+
+    def getFilepath(self) -> T:
+        return self.__filepath
+
+    def getCode(self) -> CodeType:
+        return self.__code
+
+    def toBytes(self) -> bytes:
+        return (importlib.util.MAGIC_NUMBER + BytecodeSource.FLAGS.to_bytes(4, "little") + self.__sourceHash
+                + marshal.dumps(self.__code))
+
+    def writeToFile(self, path: T) -> None:
+        with open(path, "wb") as f:
+            f.write(self.toBytes())
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import re
+from dataclasses import dataclass, field
+from typing import Optional
 
 from utils.source.Source import Source
 
@@ -9,23 +11,51 @@ from utils.source.Source import Source
 class CodeSource(Source):
     __filepath: str
     __sources: str
+    # offset of the first char of every line, built on the first line lookup
+    __lineOffsets: Optional[list[int]] = field(default=None, init=False, repr=False, compare=False)
+
+    NEWLINE = re.compile("\n")
 
     def getFilepath(self):
         return self.__filepath
 
     def writeToFile(self, path) -> None:
-        with open(path, "w") as f:
-            f.write(self.getSources())
+        with open(path, "wb") as f:
+            f.write(self.toBytes())
+
+    def toBytes(self) -> bytes:
+        return self.__sources.encode("UTF-8")
 
     def getSources(self):
         return self.__sources
 
     def setSources(self, sources: str):
         self.__sources = sources
+        self.__lineOffsets = None
 
     def getSourceLines(self):
         return self.__sources.split("\n")
 
+    def getLineOffsets(self) -> list[int]:
+        if self.__lineOffsets is None:
+            self.__lineOffsets = [0]
+            self.__lineOffsets.extend(match.end() for match in CodeSource.NEWLINE.finditer(self.__sources))
+        return self.__lineOffsets
+
+    def getSourceLine(self, lineno: int) -> Optional[str]:
+        """
+        Get a single line without splitting the whole source.
+
+        :param lineno: the 1-based line number, like AST.lineno.
+        :return: the line without the newline, or None if out of range.
+        """
+        offsets = self.getLineOffsets()
+        if lineno < 1 or lineno > len(offsets):
+            return None
+        start = offsets[lineno - 1]
+        end = offsets[lineno] - 1 if lineno < len(offsets) else len(self.__sources)
+        return self.__sources[start:end]
+
     def __hash__(self) -> int:
         return hash(self.__filepath)
 
@@ -14,3 +14,6 @@ class NativeSource(Source):
     def writeToFile(self, path: T) -> None:
         with open(path, "wb") as f:
             f.write(self.__sources)
+
+    def toBytes(self) -> bytes:
+        return self.__sources
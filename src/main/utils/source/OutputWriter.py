@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional
+
+from colorama import Fore
+
+from log.Logger import Logger
+from utils.source.Source import Source
+
+
+class OutputWriter:
+    """
+    Write sources to the output folder, files whose content is unchanged are left untouched, so their mtime is kept.
+
+    A manifest of the written files is saved in the output folder. It lets unchanged files be recognized by their
+    size and mtime without reading them, and the files whose sources disappeared be removed.
+    """
+    MANIFEST = ".pylang-manifest.json"
+
+    def __init__(self, outputPath: str, logger: Logger, keepStale: bool = False, maxWorkers: Optional[int] = None):
+        """
+        :param outputPath: the output folder.
+        :param logger: the logger.
+        :param keepStale: keep the files written by the last run but not by this one.
+        :param maxWorkers: the count of threads to write files, defaults to ThreadPoolExecutor's default.
+        """
+        self.outputPath = outputPath
+        self.logger = logger
+        self.keepStale = keepStale
+        self.maxWorkers = maxWorkers or min(32, (os.cpu_count() or 1) + 4)
+        self.written = 0
+        self.unchanged = 0
+        self.removed = 0
+
+        # state between start and finish
+        self.__executor: Optional[ThreadPoolExecutor] = None
+        self.__oldManifest: dict[str, dict] = {}
+        self.__newManifest: dict[str, dict] = {}
+        self.__pending: deque[Future] = deque()
+
+    def getPath(self, source: Source) -> str:
+        return (self.outputPath + source.getFilepath()[1::]).replace("\\", "/")
+
+    def loadManifest(self) -> dict[str, dict]:
+        """
+        :return: key: path relative to the output folder, value: the hash and mtime of the file written.
+        """
+        try:
+            with open(os.path.join(self.outputPath, OutputWriter.MANIFEST), encoding="UTF-8") as f:
+                manifest = json.load(f)
+            return manifest if isinstance(manifest, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def isUnchanged(path: str, digest: str, size: int, entry: Optional[dict]) -> bool:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_size != size:
+            return False
+        if entry is not None and entry.get("hash") == digest and entry.get("mtime") == stat.st_mtime_ns:
+            # written by the last run and not touched since
+            return True
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest() == digest
+
+    def writeSource(self, source: Source, manifest: dict[str, dict]) -> tuple[str, dict, bool]:
+        """
+        Runs in a thread of the executor, so it doesn't log, see __collect.
+
+        :return: the manifest key and entry of the file, and true if the file is written.
+        """
+        path = self.getPath(source)
+        key = os.path.relpath(path, self.outputPath).replace("\\", "/")
+        data = source.toBytes()
+        digest = hashlib.sha256(data).hexdigest()
+
+        written = False
+        if not OutputWriter.isUnchanged(path, digest, len(data), manifest.get(key)):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+            written = True
+        return key, {"hash": digest, "mtime": os.stat(path).st_mtime_ns}, written
+
+    def removeStale(self, oldManifest: dict[str, dict], newManifest: dict[str, dict]) -> None:
+        root = os.path.abspath(self.outputPath)
+        for key in oldManifest.keys() - newManifest.keys():
+            path = os.path.join(self.outputPath, key)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                self.logger.warn(f"Failed to remove stale output {path}: {e}")
+                continue
+            self.logger.debug(lambda: f"Remove stale output {Fore.CYAN}{path}")
+            self.removed += 1
+
+            # remove the folders left empty, but never the output folder itself
+            folder = os.path.dirname(os.path.abspath(path))
+            while folder != root and folder.startswith(root):
+                try:
+                    os.rmdir(folder)
+                except OSError:
+                    break
+                folder = os.path.dirname(folder)
+
+    def start(self) -> None:
+        self.__oldManifest = self.loadManifest()
+        self.__newManifest = {}
+        self.__executor = ThreadPoolExecutor(max_workers=self.maxWorkers, thread_name_prefix="OutputWriter")
+
+    def submit(self, source: Source) -> None:
+        """
+        Write a source in the background, call between start and finish.
+        """
+        assert self.__executor is not None
+        if len(self.__pending) >= self.maxWorkers * 2:
+            # bound the sources held by the queue
+            self.__collect(self.__pending.popleft())
+        self.__pending.append(self.__executor.submit(self.writeSource, source, self.__oldManifest))
+
+    def __collect(self, future: Future) -> None:
+        key, entry, written = future.result()
+        self.__newManifest[key] = entry
+        if written:
+            # logged by the main thread, the logger writing to stdout isn't thread safe
+            self.logger.debug(lambda: f"Write to {Fore.CYAN}{os.path.join(self.outputPath, key)}")
+            self.written += 1
+        else:
+            self.unchanged += 1
+
+    def finish(self) -> None:
+        """
+        Wait for all writes, remove the outputs of the last run which aren't written this time, and log a summary.
+        """
+        assert self.__executor is not None
+        for future in self.__pending:
+            self.__collect(future)
+        self.__pending.clear()
+        self.__executor.shutdown()
+        self.__executor = None
+
+        oldManifest, newManifest = self.__oldManifest, self.__newManifest
+        if self.keepStale:
+            # still tracked, so they are removed once they are stale in a run without keepStale
+            newManifest = {**oldManifest, **newManifest}
+        else:
+            self.removeStale(oldManifest, newManifest)
+
+        os.makedirs(self.outputPath, exist_ok=True)
+        with open(os.path.join(self.outputPath, OutputWriter.MANIFEST), "w", encoding="UTF-8") as f:
+            json.dump(newManifest, f, indent=1, sort_keys=True)
+
+        self.logger.info(f"Output: {self.written} written, {self.unchanged} unchanged, {self.removed} removed.")
+
+    def write(self, sources: list[Source]) -> None:
+        """
+        Write all sources, see start, submit and finish.
+        """
+        self.start()
+        for source in sources:
+            self.submit(source)
+        self.finish()
@@ -15,3 +15,10 @@ class Source(ABC):
 
     @abstractmethod
     def writeToFile(self, path: T) -> None: ...
+
+    @abstractmethod
+    def toBytes(self) -> bytes:
+        """
+        The content written to the file, used to pack sources without writing them.
+        """
+        ...
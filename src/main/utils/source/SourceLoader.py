@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import codecs
+import io
+import mmap
+import os
+import tokenize
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import Const
+from utils.source.CodeSource import CodeSource
+
+
+class SourceLoader:
+    """
+    Read python sources, every file is read exactly once and decoded from the buffer.
+    The encoding follows the BOM or the PEP 263 coding cookie, UTF-8 by default.
+    """
+    # tried in order if a file without a coding cookie isn't valid UTF-8
+    FALLBACK_CODECS = ("GBK", "ISO-8859-1")
+    # the coding cookie must be in the first two lines, no need to look further
+    HEADER_SIZE = 64 * 1024
+    # read files in a thread pool if there are at least this many
+    PARALLEL_THRESHOLD = 8
+
+    @staticmethod
+    def decode(data: bytes | mmap.mmap) -> str:
+        """
+        Decode the content of a python file.
+
+        :param data: the raw content.
+        :return: the code, with the newlines translated to '\\n'.
+        :raise UnicodeDecodeError: if no codec can decode it.
+        """
+        if data[:2] in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE):
+            encodings = ["UTF-16"]
+        else:
+            try:
+                encoding, _ = tokenize.detect_encoding(io.BytesIO(data[:SourceLoader.HEADER_SIZE]).readline)
+                # 'utf-8-sig' if there's a BOM
+                declared = encoding != "utf-8"
+            except SyntaxError:
+                # invalid or unknown coding cookie
+                encoding, declared = "utf-8", False
+            # an explicit encoding must be right, there's no point to guess
+            encodings = [encoding] if declared else [encoding, *SourceLoader.FALLBACK_CODECS]
+
+        error: Optional[UnicodeDecodeError] = None
+        for encoding in encodings:
+            try:
+                code = str(data, encoding)
+                break
+            except UnicodeDecodeError as e:
+                error = error or e
+        else:
+            raise error
+
+        if "\r" in code:
+            code = code.replace("\r\n", "\n").replace("\r", "\n")
+        return code
+
+    @staticmethod
+    def read(filename: str) -> CodeSource:
+        """
+        Read a python file, files larger than Const.MMAP_THRESHOLD are mapped instead of copied to memory.
+
+        :param filename: the path of the file.
+        :raise OSError: if the file can't be read.
+        :raise UnicodeDecodeError: if the file can't be decoded.
+        """
+        with open(filename, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size >= Const.MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    code = SourceLoader.decode(data)
+            else:
+                code = SourceLoader.decode(f.read())
+        return CodeSource(filename.replace("\\", "/"), code)
+
+    @staticmethod
+    def tryRead(filename: str) -> Optional[CodeSource]:
+        """
+        Like read, but log a warning and return None on failures.
+        """
+        try:
+            return SourceLoader.read(filename)
+        except (OSError, UnicodeDecodeError) as e:
+            Const.logger.warn(f"Failed to read {filename}. skipped.")
+            Const.logger.debug(type(e).__name__, ": ", str(e))
+            return None
+
+    @staticmethod
+    def readAll(filenames: list[str]) -> list[CodeSource]:
+        """
+        Read many files, in a thread pool if there are many, so the waits for slow disks overlap.
+
+        :param filenames: paths of the files.
+        :return: the sources in the same order, the files can't be read are skipped.
+        """
+        if len(filenames) < SourceLoader.PARALLEL_THRESHOLD:
+            sources = [SourceLoader.tryRead(filename) for filename in filenames]
+        else:
+            with ThreadPoolExecutor(thread_name_prefix="SourceLoader") as executor:
+                sources = list(executor.map(SourceLoader.tryRead, filenames))
+        return [source for source in sources if source is not None]